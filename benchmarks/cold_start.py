@@ -0,0 +1,55 @@
+"""
+Cold start timing of the sources list.
+
+Compares what InkStock used to do at startup, creating every enabled source, with what it does
+now, listing sources from their class attributes and creating one when it's opened.
+Needs a display since sources build their options ui, run from the repository root:
+
+    python benchmarks/cold_start.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk
+
+from core.constants import CACHE_DIR
+from sources.source import RemoteSource
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    if not Gtk.init_check()[0]:
+        sys.exit("Gtk failed to start, make sure $DISPLAY is set")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    _, load_ms = timed(lambda: RemoteSource.load(os.path.join(ROOT, "sources")))
+    classes = [source for source in RemoteSource.sources.values() if source.is_enabled]
+
+    def list_sources():
+        return [(source.name, source.desc, source.icon, source.source_type) for source in classes]
+
+    _, lazy_ms = timed(list_sources)
+    _, first_open_ms = timed(lambda: classes[0](CACHE_DIR, None))
+    _, eager_ms = timed(lambda: [source(CACHE_DIR, None) for source in classes])
+
+    print(f"importing {len(classes)} sources:        {load_ms:8.1f} ms")
+    print(f"listing sources (lazy, now):    {lazy_ms:8.1f} ms")
+    print(f"creating every source (before): {eager_ms:8.1f} ms")
+    print(f"opening one source ({classes[0].name}): {first_open_ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
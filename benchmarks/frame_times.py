@@ -0,0 +1,80 @@
+"""
+Main loop frame times while previews are rendered.
+
+Loads every svg under assets/ as a single view preview and as a results thumbnail through the
+pixmap manager, and times each call the main loop runs to show them. Decoding, scaling and
+encoding happen in worker threads, so every call should fit in a 16 ms frame.
+Needs a display, run from the repository root:
+
+    python benchmarks/frame_times.py
+"""
+import glob
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk
+
+from core.gui.pixmap_manager import PixmapManager
+from core.runtime import runtime
+from core.utils import asyncme
+from sources.source_file import RemoteFile
+
+
+class AssetSource:
+    """Just enough of a source to queue the pixmap manager's jobs"""
+
+    def __init__(self):
+        self.tasks = runtime.namespace("FrameTimes")
+
+    def add_task_to_queue(self, fn, callback, *args, cancel_token=None, **kwargs):
+        self.tasks.add(fn, callback, *args, cancel_token=cancel_token, **kwargs)
+
+
+class AssetFile(RemoteFile):
+    def __init__(self, source, path):
+        super().__init__(source, {"name": path, "thumbnail": path, "license": None, "file": path})
+        with open(path, mode="rb") as f:
+            self.data = f.read()
+
+    def get_thumbnail_data(self):
+        return self.data
+
+
+def run(pixmaps, files, display_type):
+    asyncme.dispatcher.frame_times.reset()
+    shown = []
+    start = time.perf_counter()
+    for file in files:
+        pixmaps.get_pixbuf_for_type(file, display_type, lambda render: shown.append(render))
+    while len(shown) < len(files):
+        Gtk.main_iteration_do(True)
+    total_ms = (time.perf_counter() - start) * 1000
+    return total_ms, asyncme.dispatcher.frame_times.summary()
+
+
+def main():
+    if not Gtk.init_check()[0]:
+        sys.exit("Gtk failed to start, make sure $DISPLAY is set")
+    paths = sorted(glob.glob(os.path.join(ROOT, "assets", "**", "*.svg"), recursive=True))
+    source = AssetSource()
+    pixmaps = PixmapManager(tempfile.mkdtemp(prefix="inkstock_bench_"))
+
+    print(f"{f'{len(paths)} svgs':10}{'total':>11}{'calls':>7}{'mean':>10}{'p95':>10}{'max':>10}{'> 16 ms':>9}")
+    for display_type in ("single", "multi"):
+        files = [AssetFile(source, path) for path in paths]
+        total_ms, summary = run(pixmaps, files, display_type)
+        print(f"{display_type:10}{total_ms:8.1f} ms{summary['calls']:7}{summary['mean_ms']:7.2f} ms"
+              f"{summary['p95_ms']:7.2f} ms{summary['max_ms']:7.2f} ms{summary['over_budget']:9}")
+
+
+if __name__ == "__main__":
+    main()
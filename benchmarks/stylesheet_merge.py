@@ -0,0 +1,107 @@
+"""
+Time to merge the stylesheets of imported svgs.
+
+The svgs under assets/ have their fills and strokes moved into a <style> block of class rules,
+the way icon sets exported from illustrators usually come, either with the rules each svg uses
+or with the stylesheet of the whole set. They're merged once with an xpath search over the whole
+document per rule, which is how imports used to do it, and once with the single walk of
+core.utils.stylesheets. Needs inkex, run from the repository root:
+
+    python benchmarks/stylesheet_merge.py [rounds]
+"""
+import glob
+import os
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from inkex import Style
+from inkex.elements import load_svg
+from lxml import etree
+
+from core.utils import stylesheets
+
+ROUNDS = 5
+PAINT_ATTRIBUTES = ("fill", "stroke")
+
+
+def with_stylesheets(paths) -> tuple[list[bytes], list[bytes]]:
+    """
+    Returns the svgs at `paths` with the paint of their elements given by class rules, once with
+    the rules each svg uses and once with the stylesheet of the whole set in every svg
+    """
+    classes = {}
+    svgs = []
+    for path in paths:
+        svg = etree.parse(path)
+        used = set()
+        for elem in svg.getroot().iter(etree.Element):
+            paint = tuple((name, elem.attrib.pop(name)) for name in PAINT_ATTRIBUTES if name in elem.attrib)
+            if paint:
+                name = classes.setdefault(paint, f"st{len(classes)}")
+                used.add(name)
+                elem.set("class", f"{elem.get('class')} {name}" if elem.get("class") else name)
+        svgs.append((svg, used))
+
+    rules = {name: f".{name}{{{';'.join(f'{key}:{value}' for key, value in paint)}}}"
+             for paint, name in classes.items()}
+    own, shared = [], []
+    for svg, used in svgs:
+        for documents, text in ((own, " ".join(rules[name] for name in sorted(used))),
+                                (shared, " ".join(rules.values()))):
+            style = etree.Element("{http://www.w3.org/2000/svg}style")
+            style.text = text
+            svg.getroot().insert(0, style)
+            documents.append(etree.tostring(svg))
+            svg.getroot().remove(style)
+    return own, shared
+
+
+def merge_per_rule(svg):
+    """The stylesheet merge imports used to do, an xpath search of the document for every rule"""
+    elems = defaultdict(list)
+    for sheet in svg.getroot().stylesheets:
+        for style in sheet:
+            xpath = style.to_xpath()
+            for elem in svg.xpath(xpath):
+                elems[elem].append(style)
+                if '@id' in xpath:
+                    elem.set_random_id()
+                if '@class' in xpath:
+                    elem.set('class', None)
+    for elem, styles in elems.items():
+        output = Style()
+        for style in styles:
+            output += style
+        elem.style = output + elem.style
+
+
+def timed(merge, documents, rounds):
+    # parsing isn't timed, only the merge
+    elapsed = 0
+    for _ in range(rounds):
+        svgs = [load_svg(data) for data in documents]
+        start = time.perf_counter()
+        for svg in svgs:
+            merge(svg)
+        elapsed += time.perf_counter() - start
+    return elapsed / rounds * 1000
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else ROUNDS
+    paths = sorted(glob.glob(os.path.join(ROOT, "assets", "**", "*.svg"), recursive=True))
+    own, shared = with_stylesheets(paths)
+
+    print(f"{f'merging {len(paths)} svgs':32}{'own rules':>12}{'whole set':>12}")
+    for name, merge in (("xpath search per rule (before)", merge_per_rule),
+                        ("single walk (now)", stylesheets.merge_stylesheets)):
+        print(f"{name:32}{timed(merge, own, rounds):9.1f} ms{timed(merge, shared, rounds):9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Time to show 500 thumbnails in a results grid.
+
+Compares styling every thumbnail with its own css provider added to the screen, which is how
+thumbnails used to be shown, with painting their pixbufs straight into the tiles. Each way runs
+in its own process since screen providers can't be taken back. Also times a style change once
+the thumbnails are shown, which has to go through every screen provider.
+Needs a display, run from the repository root:
+
+    python benchmarks/thumbnail_render.py [items]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk, GdkPixbuf
+
+from core.gui.pixmap_manager import PixmapManager
+from core.gui.thumbnail import Thumbnail
+
+ITEMS = 500
+SIZE = 200
+
+
+def flush():
+    while Gtk.events_pending():
+        Gtk.main_iteration_do(False)
+
+
+def make_thumbnail(path):
+    pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8, SIZE, SIZE)
+    pixbuf.fill(0x3366ccff)
+    pixbuf.savev(path, "png", [], [])
+
+
+def run(mode, items):
+    Gtk.init_check()
+    window = Gtk.OffscreenWindow()
+    scroll = Gtk.ScrolledWindow()
+    scroll.set_size_request(1200, 900)
+    flow_box = Gtk.FlowBox()
+    flow_box.set_homogeneous(True)
+    flow_box.set_max_children_per_line(8)
+    scroll.add(flow_box)
+    window.add(scroll)
+    window.show_all()
+    flush()
+
+    pixmaps = PixmapManager(tempfile.gettempdir())
+    path = os.path.join(tempfile.mkdtemp(prefix="inkstock_bench_"), "thumbnail.png")
+    make_thumbnail(path)
+
+    start = time.perf_counter()
+    for index in range(items):
+        tile = Gtk.Box()
+        tile.set_size_request(SIZE, SIZE)
+        if mode == "css":
+            item_id = f"id_multi{index}"
+            tile.get_style_context().add_class(item_id)
+            provider = Gtk.CssProvider()
+            provider.load_from_data(bytes(pixmaps.style.format(id=item_id, url=path), "utf8"))
+            Gtk.StyleContext.add_provider_for_screen(window.get_screen(), provider,
+                                                     Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+        else:
+            tile.thumbnail = Thumbnail(tile)
+            tile.thumbnail.set_pixbuf(pixmaps.load_render(path), pixmaps.thumbnail_style)
+        flow_box.add(tile)
+        tile.show()
+    flush()
+    window.get_pixbuf()
+    shown_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    window.get_style_context().add_class("restyled")
+    flush()
+    window.get_pixbuf()
+    restyle_ms = (time.perf_counter() - start) * 1000
+    print(f"{shown_ms:.1f} {restyle_ms:.1f}")
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else ITEMS
+    if not Gtk.init_check()[0]:
+        sys.exit("Gtk failed to start, make sure $DISPLAY is set")
+    results = {}
+    for mode in ("css", "paint"):
+        output = subprocess.run([sys.executable, __file__, "--mode", mode, str(items)],
+                                capture_output=True, text=True, check=True).stdout
+        results[mode] = [float(value) for value in output.split()]
+
+    print(f"{f'{items} thumbnails':36}{'shown':>11}{'style change':>15}")
+    print(f"css provider per thumbnail (before) {results['css'][0]:8.1f} ms {results['css'][1]:8.1f} ms")
+    print(f"painted pixbufs (now)               {results['paint'][0]:8.1f} ms {results['paint'][1]:8.1f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--mode":
+        run(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else ITEMS)
+    else:
+        main()
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from core.constants import CACHE_DIR
+
+MB = 1024 * 1024
+
+# sub folders of the cache dir, anything outside of them counts as "files"
+CATEGORY_DIRS = {
+    "http": "http",
+    "renders": "renders",
+    "fonts": "fonts",
+}
+DEFAULT_QUOTAS = {
+    "http": 256 * MB,
+    "renders": 256 * MB,
+    "fonts": 128 * MB,
+}
+DEFAULT_MAX_BYTES = 1024 * MB
+DEFAULT_MAX_AGE_DAYS = 60
+# files changed more recently than this are left alone, they may still be in use
+GRACE_SECONDS = 5 * 60
+
+
+class CacheEntry:
+    def __init__(self, path, category, size, last_used):
+        self.path = path
+        self.category = category
+        self.size = size
+        self.last_used = last_used
+
+
+class CacheManager:
+    """
+    Keeps the cache dir within a size and age budget.
+
+    Files are grouped into categories by the sub folder they live in (http responses, rendered
+    thumbnails, font previews, and everything else as "files"). Compaction first drops files older
+    than `max_age_days`, then evicts the least recently used files of every category over its quota,
+    then of the whole cache until it fits in `max_bytes`. A file's last use is its access time, or
+    its modification time if that is newer, since most systems only update access times once a day.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age_days=DEFAULT_MAX_AGE_DAYS,
+                 quotas: Optional[dict] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.quotas = dict(DEFAULT_QUOTAS if quotas is None else quotas)
+        self.last_compaction = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def category_dir(self, category) -> str:
+        """Returns the folder of a cache category, creating it if needed"""
+        path = os.path.join(self.cache_dir, CATEGORY_DIRS[category])
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def configure(self, max_bytes=None, max_age_days=None, quotas: Optional[dict] = None):
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if max_age_days is not None:
+            self.max_age_days = max_age_days
+        if quotas:
+            self.quotas.update(quotas)
+
+    def scan(self) -> list[CacheEntry]:
+        entries = []
+        dir_categories = {name: category for category, name in CATEGORY_DIRS.items()}
+        for root, dirs, files in os.walk(self.cache_dir):
+            rel = os.path.relpath(root, self.cache_dir)
+            top = rel.split(os.sep)[0]
+            category = dir_categories.get(top, "files")
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append(CacheEntry(path, category, stat.st_size, max(stat.st_atime, stat.st_mtime)))
+        return entries
+
+    def stats(self) -> dict:
+        """Returns the number of files and bytes used per category and in total"""
+        categories = {category: {"files": 0, "bytes": 0, "quota": self.quotas.get(category)}
+                      for category in (*CATEGORY_DIRS, "files")}
+        for entry in self.scan():
+            categories[entry.category]["files"] += 1
+            categories[entry.category]["bytes"] += entry.size
+        return {
+            "categories": categories,
+            "files": sum(c["files"] for c in categories.values()),
+            "bytes": sum(c["bytes"] for c in categories.values()),
+            "max_bytes": self.max_bytes,
+            "max_age_days": self.max_age_days,
+            "last_compaction": self.last_compaction,
+        }
+
+    def compact(self) -> dict:
+        """Evicts files until the cache is within its budget, returns what was removed"""
+        with self._lock:
+            now = time.time()
+            entries = self.scan()
+            usage = {}
+            for entry in entries:
+                usage[entry.category] = usage.get(entry.category, 0) + entry.size
+            # oldest first, skipping files that might still be in use
+            candidates = sorted((e for e in entries if now - e.last_used > GRACE_SECONDS), key=lambda e: e.last_used)
+            evicted = set()
+
+            def evict(entry):
+                evicted.add(entry)
+                usage[entry.category] -= entry.size
+
+            if self.max_age_days:
+                max_age = self.max_age_days * 24 * 60 * 60
+                for entry in candidates:
+                    if now - entry.last_used <= max_age:
+                        break
+                    evict(entry)
+
+            for category, quota in self.quotas.items():
+                if quota is None:
+                    continue
+                for entry in candidates:
+                    if usage.get(category, 0) <= quota:
+                        break
+                    if entry.category == category and entry not in evicted:
+                        evict(entry)
+
+            if self.max_bytes:
+                for entry in candidates:
+                    if sum(usage.values()) <= self.max_bytes:
+                        break
+                    if entry not in evicted:
+                        evict(entry)
+
+            freed = 0
+            removed = 0
+            for entry in evicted:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+                freed += entry.size
+                removed += 1
+            self._remove_empty_dirs()
+
+            self.last_compaction = {"time": now, "files_removed": removed, "bytes_freed": freed}
+            return self.last_compaction
+
+    def compact_in_background(self):
+        """Runs a compaction pass in a daemon thread, used at startup"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            try:
+                result = self.compact()
+                if result["files_removed"]:
+                    print(f"Cache compaction removed {result['files_removed']} files "
+                          f"({result['bytes_freed'] / MB:.1f} MB)")
+            except Exception as err:
+                print(f"Error occurred during cache compaction: {err}")
+
+        self._thread = threading.Thread(target=run, daemon=True, name="CacheCompaction")
+        self._thread.start()
+
+    def _remove_empty_dirs(self):
+        keep = {os.path.join(self.cache_dir, name) for name in CATEGORY_DIRS.values()}
+        now = time.time()
+        for root, dirs, files in os.walk(self.cache_dir, topdown=False):
+            if root == self.cache_dir or root in keep or files:
+                continue
+            try:
+                # a freshly made folder is probably about to be written to
+                if now - os.stat(root).st_mtime > GRACE_SECONDS:
+                    os.rmdir(root)
+            except OSError:
+                pass
+
+
+cache_manager = CacheManager()
@@ -0,0 +1,265 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Optional
+
+from core.constants import CACHE_DIR
+from sources.source_file import RemoteFile
+
+# size of the chunks read from a download stream
+CHUNK_SIZE = 64 * 1024
+# downloads streamed into an archive are kept in memory up to this size before spilling to disk
+SPOOL_SIZE = 8 * 1024 * 1024
+# formats that are already compressed, deflating them again only costs time
+STORED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".zip", ".woff", ".woff2"}
+
+
+def zip_compression_for(name: str) -> int:
+    """Returns the zip compression to use for a file, based on its extension"""
+    ext = os.path.splitext(name)[1].lower()
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+async def apply_tasks_to_file(file: RemoteFile, file_path: str):
+    for task in file.tasks:
+        await task.do_task(file_path)
+
+
+class ExportItem:
+    """A file to export together with the path it should have in the export, relative to its root"""
+
+    def __init__(self, source, file: RemoteFile, arcname: str):
+        self.source = source
+        self.file = file
+        self.arcname = arcname
+
+
+class ExportProgress:
+    """Aggregate progress of a bulk export, handed to the progress callback"""
+
+    def __init__(self, total_items):
+        self.total_items = total_items
+        self.done_items = 0
+        self.failed_items = 0
+        self.bytes_downloaded = 0
+        self.current = None
+
+    @property
+    def fraction(self):
+        if not self.total_items:
+            return 1.0
+        return (self.done_items + self.failed_items) / self.total_items
+
+
+class ProgressThrottle:
+    """Calls `callback` with the latest progress at most once every `interval` seconds"""
+
+    def __init__(self, callback: Optional[Callable[[ExportProgress], None]], interval=0.1):
+        self.callback = callback
+        self.interval = interval
+        self._last = 0
+        self._lock = threading.Lock()
+
+    def update(self, progress: ExportProgress, force=False):
+        if not self.callback:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last < self.interval:
+                return
+            self._last = now
+        self.callback(progress)
+
+
+class ExportSink:
+    """Receives every exported file as soon as it is ready"""
+
+    # sinks that accept streams get files that need no tasks as a file object instead of a staged file
+    accepts_streams = False
+
+    def open(self):
+        pass
+
+    def add(self, item: ExportItem, file_path: str):
+        raise NotImplementedError()
+
+    def add_stream(self, item: ExportItem, stream: BinaryIO):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+
+class FolderSink(ExportSink):
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+
+    def add(self, item: ExportItem, file_path: str):
+        dest = os.path.join(self.folder_path, item.arcname)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.move(file_path, dest)
+
+
+class ZipSink(ExportSink):
+    """
+    Writes each file into the archive as soon as it finishes, instead of zipping a folder at the end.
+    Downloads that need no tasks are streamed into their entry without being staged on disk,
+    JPEGs and PNGs are stored as they are and everything else (e.g. SVGs) is deflated.
+    """
+
+    accepts_streams = True
+
+    def __init__(self, zip_path):
+        self.zip_path = zip_path
+        self.zip: Optional[zipfile.ZipFile] = None
+
+    def open(self):
+        self.zip = zipfile.ZipFile(self.zip_path, mode="w")
+
+    def add(self, item: ExportItem, file_path: str):
+        self.zip.write(file_path, arcname=item.arcname, compress_type=zip_compression_for(item.arcname))
+        os.remove(file_path)
+
+    def add_stream(self, item: ExportItem, stream: BinaryIO):
+        info = zipfile.ZipInfo(item.arcname.replace(os.sep, "/"), date_time=time.localtime()[:6])
+        info.compress_type = zip_compression_for(item.arcname)
+        info.external_attr = 0o644 << 16
+        with self.zip.open(info, mode="w") as entry:
+            shutil.copyfileobj(stream, entry, CHUNK_SIZE)
+
+    def close(self):
+        if self.zip:
+            self.zip.close()
+            self.zip = None
+
+
+class BatchSink(ExportSink):
+    """
+    Keeps every finished file and hands them all to `fn` once the export is done, used to import
+    files into Inkscape in one pass instead of one document change per file.
+    """
+
+    def __init__(self, fn: Callable[[list[ExportItem], list[str]], None]):
+        self.fn = fn
+        self.items: list[ExportItem] = []
+        self.file_paths: list[str] = []
+
+    def add(self, item: ExportItem, file_path: str):
+        # staged files are kept until the export's staging folder is removed, after close
+        self.items.append(item)
+        self.file_paths.append(file_path)
+
+    def close(self):
+        items, file_paths = self.items, self.file_paths
+        self.items, self.file_paths = [], []
+        if file_paths:
+            self.fn(items, file_paths)
+
+
+class BulkExporter:
+    """
+    Exports many remote files at once.
+
+    Up to `max_downloads` files are downloaded at the same time, `tasks` (e.g. colour replacement)
+    are applied to finished downloads in a separate pool of `max_task_workers` threads so they don't
+    hold up the downloads, and each file is handed to the sink as soon as it is done.
+    Progress is reported for the whole export, at most every `progress_interval` seconds.
+    """
+
+    def __init__(self, session, max_downloads=6, max_task_workers=4, on_progress=None, progress_interval=0.1):
+        self.session = session
+        self.max_downloads = max_downloads
+        self.max_task_workers = max_task_workers
+        self.throttle = ProgressThrottle(on_progress, progress_interval)
+        self.progress: Optional[ExportProgress] = None
+        self._progress_lock = threading.Lock()
+
+    async def export(self, items: list[ExportItem], sink: ExportSink) -> list[tuple[ExportItem, Exception]]:
+        """Exports all `items` into `sink` and returns the items that failed along with their errors"""
+        loop = asyncio.get_running_loop()
+        self.progress = ExportProgress(len(items))
+        self.throttle.update(self.progress, force=True)
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix="export_", dir=CACHE_DIR)
+        download_pool = ThreadPoolExecutor(max_workers=self.max_downloads, thread_name_prefix="ExportDownload")
+        task_pool = ThreadPoolExecutor(max_workers=self.max_task_workers, thread_name_prefix="ExportTask")
+        # sinks write to a single archive or document, so only one item is added at a time
+        sink_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ExportSink")
+        failed = []
+
+        async def export_item(index, item: ExportItem):
+            # each item gets its own folder so the staged file keeps its original name
+            staged = os.path.join(staging_dir, str(index), os.path.basename(item.arcname))
+            try:
+                if sink.accepts_streams and not item.file.tasks:
+                    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, dir=staging_dir) as buffer:
+                        await loop.run_in_executor(download_pool, self.download_to, item, buffer)
+                        buffer.seek(0)
+                        await loop.run_in_executor(sink_pool, sink.add_stream, item, buffer)
+                    self._count(done=1)
+                    return
+                os.makedirs(os.path.dirname(staged))
+                await loop.run_in_executor(download_pool, self.download, item, staged)
+                if item.file.tasks:
+                    await loop.run_in_executor(task_pool, self.apply_tasks, item, staged)
+                await loop.run_in_executor(sink_pool, sink.add, item, staged)
+            except Exception as err:
+                failed.append((item, err))
+                self._count(failed=1)
+            else:
+                self._count(done=1)
+
+        try:
+            await loop.run_in_executor(sink_pool, sink.open)
+            await asyncio.gather(*(export_item(index, item) for index, item in enumerate(items)))
+        finally:
+            await loop.run_in_executor(sink_pool, sink.close)
+            for pool in (download_pool, task_pool, sink_pool):
+                pool.shutdown(wait=False)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            self.throttle.update(self.progress, force=True)
+        return failed
+
+    def download(self, item: ExportItem, file_path: str):
+        with open(file_path, mode="wb") as out:
+            self.download_to(item, out)
+
+    def download_to(self, item: ExportItem, out: BinaryIO):
+        url = item.file.get_file()
+        with self.session.get(url, stream=True) as r:
+            r.raise_for_status()
+            for data in r.iter_content(chunk_size=CHUNK_SIZE):
+                out.write(data)
+                self._count(downloaded=len(data), current=item)
+
+    @staticmethod
+    def apply_tasks(item: ExportItem, file_path: str):
+        # tasks are coroutines but do their work synchronously, each worker runs them in its own loop
+        asyncio.run(apply_tasks_to_file(item.file, file_path))
+
+    def _count(self, done=0, failed=0, downloaded=0, current=None):
+        with self._progress_lock:
+            self.progress.done_items += done
+            self.progress.failed_items += failed
+            self.progress.bytes_downloaded += downloaded
+            if current:
+                self.progress.current = current
+        self.throttle.update(self.progress)
+
+
+def unique_arcname(arcname: str, taken: set) -> str:
+    """Appends a counter to `arcname` if another file is already exported under the same name"""
+    name, ext = os.path.splitext(arcname)
+    candidate = arcname
+    count = 1
+    while candidate in taken:
+        candidate = f"{name} ({count}){ext}"
+        count += 1
+    taken.add(candidate)
+    return candidate
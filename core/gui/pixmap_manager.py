@@ -1,19 +1,66 @@
 import math
 import os
+from functools import partial
+from typing import Optional
 
-from gi.repository import GLib, GdkPixbuf
+from gi.repository import GdkPixbuf
 
-BILINEAR = GdkPixbuf.InterpType.BILINEAR
-HYPER = GdkPixbuf.InterpType.HYPER
+from core.gui.pyramid import ThumbnailPyramid, pyramid_cache
+from core.gui.render_cache import render_cache
+from core.gui.thumbnail import ThumbnailStyle
+from core.runtime import runtime
+from core.utils import asyncme
 
 SIZE_ASPECT_GROW = 0
 SIZE_ASPECT_CROP = 1
 
+# views a file's thumbnails are shown in, all scaled from the file's pyramid
+VIEWS = ("multi", "thumb", "single")
+
+
+def scaled_size(width, height, scale) -> tuple[int, int]:
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+class RenderGeometry:
+    """
+    Where the image of a thumbnail ends up: rasterised at `size`, cropped to `crop` (x, y, width, height)
+    and, for thumbnails with a canvas of their own, drawn on a `canvas` sized pixbuf at `offset`
+    """
+
+    def __init__(self, size, crop, canvas=None, offset=(0, 0)):
+        self.size = size
+        self.crop = crop
+        self.canvas = canvas
+        self.offset = offset
+
+    def apply(self, img: GdkPixbuf.Pixbuf) -> GdkPixbuf.Pixbuf:
+        """Crops and places an image rasterised at `size`, the crop is a view of it and not a copy"""
+        img_w, img_h = img.get_width(), img.get_height()
+        x, y, width, height = self.crop
+        # the loader may round the size it was asked for
+        x, y = min(max(0, x), img_w - 1), min(max(0, y), img_h - 1)
+        width, height = max(1, min(width, img_w - x)), max(1, min(height, img_h - y))
+        if (x, y, width, height) != (0, 0, img_w, img_h):
+            img = img.new_subpixbuf(x, y, width, height)
+        if not self.canvas:
+            return img
+
+        canvas = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8, *self.canvas)
+        canvas.fill(0x00000000)
+        offset_x, offset_y = self.offset
+        width, height = min(width, self.canvas[0] - offset_x), min(height, self.canvas[1] - offset_y)
+        if width > 0 and height > 0:
+            img.copy_area(0, 0, width, height, canvas, offset_x, offset_y)
+        return canvas
+
 
 class PixmapManager:
     pixmap_dir = None
     # Default styling for multiview thumbnails, All styles must follow this template
-    # could be overridden when providing a pixmap manager by sources
+    # could be overridden when providing a pixmap manager by sources.
+    # Thumbnails are painted with the background size, color and border radius of the .{id} rule,
+    # other rules are added to the screen once
     style = """.{id}{{
             background-size: cover;
             background-origin: content-box;
@@ -21,10 +68,11 @@ class PixmapManager:
             background-image: url("{url}");
             background-repeat: no-repeat; 
             }}
-            
-            window flowbox > flowboxchild {{
+        """
+    # styling shared by all the thumbnails of a grid, installed once for the screen
+    grid_style = """window flowbox > flowboxchild {
             border-radius: 5%;
-            }}
+            }
         """
 
     def __init__(self, cache_dir, scale=0.7, pref_width=200, pref_height=200,
@@ -48,53 +96,223 @@ class PixmapManager:
         self.single_preview_scale = self.scale
         self.cache_dir = cache_dir
         self.cache = {}
-
-    @staticmethod
-    async def _apply_tasks_to_item(remote_file, display_type, callback, *args):
-        filepath = remote_file.get_thumbnail()
-        for task in remote_file.tasks:
-            if task.is_active:
+        self.render_cache = render_cache
+        self.pyramids = pyramid_cache
+        self._thumbnail_style = None
+
+    def __getstate__(self):
+        # sent to batch recolour processes, which render with caches of their own
+        state = self.__dict__.copy()
+        for name in ("cache", "render_cache", "pyramids", "_thumbnail_style"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.cache = {}
+        self.render_cache = render_cache
+        self.pyramids = pyramid_cache
+        self._thumbnail_style = None
+
+    @property
+    def thumbnail_style(self) -> ThumbnailStyle:
+        """How thumbnails are painted, read from `style` which sources may replace"""
+        if self._thumbnail_style is None or self._thumbnail_style.template != self.style:
+            self._thumbnail_style = ThumbnailStyle.from_css(self.style)
+        return self._thumbnail_style
+
+    def load_render(self, path) -> Optional[GdkPixbuf.Pixbuf]:
+        """Returns the pixbuf of a rendered thumbnail, from memory if it's still in the render cache"""
+        if os.path.dirname(path) == self.render_cache.renders_dir:
+            pixbuf = self.render_cache.get_pixbuf(os.path.splitext(os.path.basename(path))[0])
+            if pixbuf:
+                return pixbuf
+            if not os.path.isfile(path):
+                # renders of thumbnails in memory aren't saved, this one was dropped from the cache
+                return None
+        return GdkPixbuf.Pixbuf.new_from_file(path)
+
+    def render_params(self, display_type):
+        """Settings a thumbnail of `display_type` is rendered with, part of its render cache key.
+        They're the view settings its geometry is worked out from, so the key follows any change to them"""
+        return self.view_settings(display_type)
+
+    def render_key(self, thumbnail, display_type, active_tasks):
+        """
+        Returns the render cache key of `thumbnail` shown as `display_type` with `active_tasks` applied,
+        `thumbnail` is the path of the file or its data for thumbnails in memory
+        """
+        make_key = self.render_cache.make_data_key if isinstance(thumbnail, bytes) else self.render_cache.make_key
+        return make_key(thumbnail, display_type, self.render_params(display_type),
+                        [task.fingerprint() for task in active_tasks])
+
+    def keep_render(self, data: bytes, display_type, pixbuf: GdkPixbuf.Pixbuf) -> Optional[str]:
+        """Keeps the render of an in memory thumbnail in the render cache, unsaved, and returns its render path"""
+        if not pixbuf:
+            return None
+        return self.render_cache.put(self.render_key(data, display_type, []), pixbuf, save=False)
+
+    def find_render(self, thumbnail, display_type, active_tasks) -> tuple[Optional[str], bool]:
+        """Returns the render key of a thumbnail and whether it's rendered already, hashing the thumbnail blocks"""
+        key = self.render_key(thumbnail, display_type, active_tasks)
+        return key, bool(key) and self.render_cache.has_render(key)
+
+    async def _apply_tasks_to_item(self, remote_file, display_type, callback, *args, cancel_token=None):
+        active_tasks = [task for task in remote_file.tasks if task.is_active]
+        data = remote_file.get_thumbnail_data()
+        if data is not None and all(task.in_memory for task in active_tasks):
+            return await self._apply_tasks_to_data(data, active_tasks, display_type, callback, *args,
+                                                   cancel_token=cancel_token)
+
+        filepath = await remote_file.load_thumbnail()
+        key = None
+        if cancel_token and cancel_token.cancelled:
+            return None
+        if filepath and self.data_is_file(filepath):
+            key, rendered = await runtime.run_blocking(self.find_render, filepath, display_type, active_tasks)
+            # a cached render already has the tasks applied, there's nothing left to do
+            if rendered:
+                return filepath, display_type, key, callback, *args
+            for task in active_tasks:
+                if cancel_token and cancel_token.cancelled:
+                    return None
                 filepath = await task.do_task(filepath)
-        return filepath, display_type, callback, *args
-
-    def _get_pixbuf_for_type(self, args):
-        thumbnail, display_type, callback, *args = args
+        return filepath, display_type, key, callback, *args
+
+    async def _apply_tasks_to_data(self, data, active_tasks, display_type, callback, *args, cancel_token=None):
+        """Applies the tasks of a thumbnail that's in memory, nothing is written to or read from a file"""
+        key, rendered = await runtime.run_blocking(self.find_render, data, display_type, active_tasks)
+        if rendered:
+            return data, display_type, key, callback, *args
+        for task in active_tasks:
+            if cancel_token and cancel_token.cancelled:
+                return None
+            data = await task.do_task_on_data(data)
+        return data, display_type, key, callback, *args
+
+    async def _load_item(self, remote_file, display_type, callback, *args, cancel_token=None):
+        """Gets a thumbnail ready to be shown as `display_type`, without any of it running in the main loop"""
+        result = await self._apply_tasks_to_item(remote_file, display_type, callback, *args,
+                                                 cancel_token=cancel_token)
+        if result is None:
+            return None
+        # decoding, scaling and png encoding run in the worker threads
+        return await runtime.run_blocking(self._render_for_type, result, cancel_token)
+
+    def _render_for_type(self, args, cancel_token=None):
+        """Returns (callback, rendered thumbnail, callback args) for the main loop, runs in a worker thread"""
+        thumbnail, display_type, key, callback, *args = args
+
+        if not thumbnail or (cancel_token and cancel_token.cancelled):
+            return None
+        # renders of thumbnails in memory are only kept in memory
+        in_memory = isinstance(thumbnail, bytes)
+
+        # for thumbnails in multi view and single view
+        if display_type in ("multi", "thumb"):
+            pixbuf_path = key and self._find_render(key, in_memory)
+            if pixbuf_path:
+                # decoded into the render cache here, so painting it in the main loop doesn't have to
+                self.render_cache.get_pixbuf(key)
+            else:
+                pixbuf = self.render_pixbuf(thumbnail, display_type, self.pyramid_key(thumbnail))
+                fallback_path = None
+                if not in_memory:
+                    fallback_path = thumbnail if display_type == "multi" else thumbnail + ".thumb"
+                pixbuf_path = self._store_render(key, fallback_path, pixbuf, save=not in_memory)
+            return callback, pixbuf_path, args
+        # for preview image in single view
+        elif display_type == "single":
+            pixbuf = key and self.render_cache.get_pixbuf(key)
+            if not pixbuf:
+                pixbuf = self.render_pixbuf(thumbnail, display_type, self.pyramid_key(thumbnail))
+                if key and pixbuf:
+                    self.render_cache.put(key, pixbuf, save=not in_memory)
+            return callback, pixbuf, args
+        return None
 
-        if not thumbnail:
+    @staticmethod
+    def _show_render(callback, render, args, cancel_token=None):
+        if cancel_token and cancel_token.cancelled:
             return
+        callback(render, *args)
 
-        # for thumbnails in multi view
-        if display_type == "multi":
-            pixbuf_path = self.get_pixbuf(thumbnail, self.pref_width, self.pref_height, self.padding, self.scale,
-                                          SIZE_ASPECT_CROP)
+    def _find_render(self, key, in_memory=False) -> Optional[str]:
+        if in_memory:
+            return self.render_cache.get_path(key) if self.render_cache.has_render(key) else None
+        return self.render_cache.get_file(key)
 
-            callback(pixbuf_path, *args)
-        # for thumbnails in single view
+    def view_settings(self, display_type):
+        """Returns (pref width, pref height, padding, scale, aspect ratio, enable aspect, enable padding)
+        of the thumbnails of `display_type`"""
+        if display_type == "multi":
+            return (self.pref_width, self.pref_height, self.padding, self.scale, SIZE_ASPECT_CROP,
+                    self.enable_aspect, self.enable_padding)
         elif display_type == "thumb":
-            pixbuf_path = self.get_pixbuf(thumbnail, self.preview_item_width, self.preview_item_height,
-                                          self.preview_padding, self.preview_scaling, self.preview_aspect_ratio,
-                                          thumbnail=True)
-
-            callback(pixbuf_path, *args)
-        # for preview image in single view
+            return (self.preview_item_width, self.preview_item_height, self.preview_padding, self.preview_scaling,
+                    self.preview_aspect_ratio, self.enable_aspect, self.enable_padding)
         elif display_type == "single":
-            # TODO: Find a neater way to reset and restore values
-            padding = self.enable_padding
-            self.enable_padding = False
-            aspect = self.enable_aspect
-            self.enable_aspect = False
-
-            pixbuf = self.get_pixbuf(thumbnail, self.pref_width, self.pref_height, self.padding,
-                                     self.single_preview_scale, SIZE_ASPECT_GROW, return_pixbuf=True)
-            self.enable_padding = padding
-            self.enable_aspect = aspect
-            del padding
-            del aspect
-            callback(pixbuf, *args)
-
-        return False
-
-    def get_pixbuf_for_type(self, remote_file, display_type, callback, *args):
+            # the preview image is shown whole, without aspect or padding
+            return (self.pref_width, self.pref_height, self.padding, self.single_preview_scale, SIZE_ASPECT_GROW,
+                    False, False)
+        return None
+
+    def view_geometry(self, display_type, width, height) -> RenderGeometry:
+        """Geometry of a `width` x `height` image shown as `display_type`"""
+        pref_width, pref_height, padding, scale, aspect_ratio, enable_aspect, enable_padding = \
+            self.view_settings(display_type)
+        width, height = scaled_size(width, height, scale)
+        return self.render_geometry(width, height, pref_width, pref_height, padding, aspect_ratio,
+                                    enable_aspect, enable_padding)
+
+    def pyramid_key(self, thumbnail) -> Optional[str]:
+        """Key of the pyramid of a thumbnail (with its tasks applied), made for the sizes of every view"""
+        make_key = self.render_cache.make_data_key if isinstance(thumbnail, bytes) else self.render_cache.make_key
+        return make_key(thumbnail, "pyramid", [self.render_params(display_type) for display_type in VIEWS])
+
+    def make_pyramid(self, thumbnail) -> ThumbnailPyramid:
+        """Rasterises a thumbnail once, at the biggest size any view shows it at"""
+
+        def full_size(width, height):
+            sizes = [self.view_geometry(display_type, width, height).size for display_type in VIEWS]
+            return max(size[0] for size in sizes), max(size[1] for size in sizes)
+
+        full, source_size = self.rasterise(thumbnail, full_size)
+        return ThumbnailPyramid(full, source_size)
+
+    def render_pixbuf(self, thumbnail, display_type, pyramid_key=None) -> Optional[GdkPixbuf.Pixbuf]:
+        """
+        Renders a thumbnail file (or its data) the way `display_type` is shown.
+        With a `pyramid_key` the views of a file are scaled from one pyramid, rasterised once
+        """
+        if display_type not in VIEWS:
+            return None
+        if pyramid_key:
+            source = thumbnail if isinstance(thumbnail, bytes) else self.get_pixmap_path(thumbnail)
+            pyramid = self.pyramids.get_or_make(pyramid_key, partial(self.make_pyramid, source))
+            layout = self.view_geometry(display_type, *pyramid.source_size)
+            return layout.apply(pyramid.scaled(*layout.size))
+
+        pref_width, pref_height, padding, scale, aspect_ratio, enable_aspect, enable_padding = \
+            self.view_settings(display_type)
+
+        def geometry(width, height):
+            return self.render_geometry(width, height, pref_width, pref_height, padding, aspect_ratio,
+                                        enable_aspect, enable_padding)
+
+        source = thumbnail if isinstance(thumbnail, bytes) else self.get_pixmap_path(thumbnail)
+        return self.load_image(source, scale, geometry)
+
+    def _store_render(self, key, fallback_path, pixbuf, save=True):
+        if not pixbuf:
+            return None
+        if key:
+            return self.render_cache.put(key, pixbuf, save)
+        # files that can't be hashed are rendered next to the thumbnail like before
+        pixbuf.savev(fallback_path, "png")
+        return fallback_path
+
+    def get_pixbuf_for_type(self, remote_file, display_type, callback, *args, cancel_token=None):
         # return pixbuf immediately for source icons, no need to fetch asynchronously
         # since it doesn't take much time
         if display_type == "icon":
@@ -106,23 +324,29 @@ class PixmapManager:
             if error:
                 print(error)
             if result:
-                GLib.idle_add(self._get_pixbuf_for_type, result)
+                # only the rendered thumbnail is handed to the main loop,
+                # in batches that fit in a frame rather than an idle dispatch each
+                on_render, render, render_args = result
+                asyncme.dispatcher.post(self._show_render, on_render, render, render_args, cancel_token)
 
+        # jobs of results that were cleared are skipped, or stopped before their next step
         source = remote_file.source
-        source.add_task_to_queue(self._apply_tasks_to_item, cb, remote_file, display_type, callback, *args),
+        source.add_task_to_queue(partial(self._load_item, cancel_token=cancel_token), cb,
+                                 remote_file, display_type, callback, *args, cancel_token=cancel_token)
 
     def get_pixbuf(self, name: str, pref_width, pref_height, padding, scale, aspect_ratio, return_pixbuf=False,
                    thumbnail=False):
 
-        pixmap_path = self.get_pixmap_path(name)
+        # thumbnails in memory are decoded from their data and can only be returned as pixbufs
+        in_memory = isinstance(name, bytes)
+        pixmap_path = None if in_memory else self.get_pixmap_path(name)
 
-        if self.data_is_file(name):
-            img = self.load_file_from_path(pixmap_path, scale)
+        if in_memory or self.data_is_file(name):
+            # the image is rasterised once, straight at the size it ends up with
+            def geometry(width, height):
+                return self.render_geometry(width, height, pref_width, pref_height, padding, aspect_ratio)
 
-            if self.enable_aspect:
-                img = self.set_aspect(img, pref_width, pref_height, aspect_ratio)
-            if self.enable_padding:
-                img = self.set_padding(img, padding)
+            img = self.load_image(name if in_memory else pixmap_path, scale, geometry)
             if thumbnail:
                 pixmap_path = pixmap_path + ".thumb"
             if not return_pixbuf:
@@ -132,16 +356,50 @@ class PixmapManager:
             else:
                 return pixmap_path
 
-    def set_aspect(self, img: GdkPixbuf.Pixbuf, pref_width, pref_height,
-                   aspect_ratio=SIZE_ASPECT_CROP) -> GdkPixbuf.Pixbuf:
-        img_w = img.get_width()
-        img_h = img.get_height()
-        aspect = img_w / img_h
-
-        mod_img = None
+    def render_geometry(self, width, height, pref_width, pref_height, padding, aspect_ratio=SIZE_ASPECT_CROP,
+                        enable_aspect=None, enable_padding=None) -> RenderGeometry:
+        """
+        Works out how a `width` x `height` image is scaled, cropped (or fitted) and padded up front,
+        so the image can be rasterised at its final size instead of being scaled and copied after.
+        `enable_aspect` and `enable_padding` default to the pixmap manager's
+        """
+        enable_aspect = self.enable_aspect if enable_aspect is None else enable_aspect
+        enable_padding = self.enable_padding if enable_padding is None else enable_padding
+        size = (width, height)
+        crop = (0, 0, width, height)
+        canvas = None
+        offset = (0, 0)
+        if enable_aspect:
+            size = tuple(int(length) for length in self.aspect_size(width, height, pref_width, pref_height,
+                                                                     aspect_ratio))
+            scaled_w, scaled_h = size
+            if aspect_ratio == SIZE_ASPECT_CROP:
+                crop_w, crop_h = min(pref_width, scaled_w), min(pref_height, scaled_h)
+                crop = (math.floor(scaled_w / 2 - crop_w / 2), math.floor(scaled_h / 2 - crop_h / 2), crop_w, crop_h)
+            else:
+                canvas = (pref_width, pref_height)
+                crop = (0, 0, scaled_w, scaled_h)
+                offset = (math.floor(pref_width / 2 - min(pref_width, scaled_w) / 2),
+                          math.floor(pref_height / 2 - min(scaled_h, pref_height) / 2))
+
+        if enable_padding and padding > 0:
+            # padding shrinks everything into a canvas the size the image had without it
+            out_w, out_h = canvas or crop[2:]
+            factor_x, factor_y = out_w / (out_w + padding), out_h / (out_h + padding)
+            pad_x = math.floor((out_w + padding) / 2 - out_w / 2)
+            pad_y = math.floor((out_h + padding) / 2 - out_h / 2)
+            size = (max(1, round(size[0] * factor_x)), max(1, round(size[1] * factor_y)))
+            crop = (round(crop[0] * factor_x), round(crop[1] * factor_y),
+                    max(1, round(crop[2] * factor_x)), max(1, round(crop[3] * factor_y)))
+            offset = (round((pad_x + offset[0]) * factor_x), round((pad_y + offset[1]) * factor_y))
+            canvas = (out_w, out_h)
+        return RenderGeometry(size, crop, canvas, offset)
 
+    @staticmethod
+    def aspect_size(img_w, img_h, pref_width, pref_height, aspect_ratio=SIZE_ASPECT_CROP) -> tuple[float, float]:
+        """Size an `img_w` x `img_h` image is scaled to, before cropping or fitting it"""
+        aspect = img_w / img_h
         if aspect_ratio == SIZE_ASPECT_CROP:
-
             w_greater = pref_width > img_w and pref_width > pref_height
             h_greater = pref_height > img_h and pref_height > pref_width
             both_greater = pref_width > img_w and pref_height > img_h
@@ -151,11 +409,9 @@ class PixmapManager:
                 else we scale up using the height calculating
                 the width based on the aspect ratio"""
             if w_greater:
-                h = pref_width / aspect
-                img = img.scale_simple(pref_width, h, BILINEAR)
+                return pref_width, pref_width / aspect
             elif h_greater:
-                w = pref_height / aspect
-                img = img.scale_simple(w, pref_height, BILINEAR)
+                return pref_height / aspect, pref_height
             elif not both_greater:
                 """if both are lesser we scale down the image by scaling down the shortest side and calculating
                 the longer side based on the aspect ratio"""
@@ -167,76 +423,60 @@ class PixmapManager:
                     the width from being shorter than the final image width
                     and vice versa for the height, taking padding into consideration
                     """
-                    h = pref_width / aspect
-                    img = img.scale_simple(pref_width, h, BILINEAR)
+                    return pref_width, pref_width / aspect
                 else:  # height of img is greater
-                    w = pref_height * aspect
-                    img = img.scale_simple(w, pref_height, BILINEAR)
-
-            cropped = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8, pref_width,
-                                           pref_height)
-            # cropped.fill(0xffffffff)
-            """we minus the left coord of pref from the img to get the 
-            coord of the final image"""
-
-            x = img.get_width() / 2 - min(pref_width, img.get_width()) / 2
-            y = img.get_height() / 2 - min(img.get_height(), pref_height) / 2
-
-            cropped = img.new_subpixbuf(math.floor(x), math.floor(y), min(pref_width, img.get_width()),
-                                        min(pref_height, img.get_height()))
-
-            mod_img = cropped
-        else:
-            if img_w > img_h:
-                img = img.scale_simple(pref_width, pref_width / aspect, HYPER)
-            elif img_h > img_w:
-                img = img.scale_simple(pref_height * aspect, pref_height, HYPER)
-            else:
-                img = img.scale_simple(pref_width, pref_width, HYPER)
-
-            # FIXME: Make filling resized image unto new pixbuf
-            filled = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8, pref_width,
-                                          pref_height)
-            x = pref_width / 2 - min(pref_width, img.get_width()) / 2
-            y = pref_height / 2 - min(img.get_height(), pref_height) / 2
-
-            img.copy_area(0, 0, img.get_width(), img.get_height(), filled, math.floor(x), math.floor(y))
-            mod_img = filled
-        # if padding > 0:
-        #     padded = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 24, pref_width + padding,
-        #                                   pref_height + padding)
-        #     x = padded.get_width() / 2 - min(padded.get_width(), mod_img.get_width()) / 2
-        #     y = padded.get_height() / 2 - min(padded.get_height(), mod_img.get_height()) / 2
-        #
-        #     mod_img.copy_area(0, 0, mod_img.get_width(), mod_img.get_height(), padded, math.floor(x), math.floor(y))
-        #     del mod_img
-        #     return padded.scale_simple(pref_width, pref_height, BILINEAR)
-        return mod_img
-
-    def set_padding(self, img, padding):
-        width = img.get_width()
-        height = img.get_height()
-
-        if padding > 0:
-            padded = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8, width + padding,
-                                          height + padding)
-            x = padded.get_width() / 2 - min(padded.get_width(), width) / 2
-            y = padded.get_height() / 2 - min(padded.get_height(), height) / 2
-
-            img.copy_area(0, 0, width, height, padded, math.floor(x), math.floor(y))
-
-            return padded.scale_simple(width, height, HYPER)
-        return img
+                    return pref_height * aspect, pref_height
+            return img_w, img_h
+        if img_w > img_h:
+            return pref_width, pref_width / aspect
+        elif img_h > img_w:
+            return pref_height * aspect, pref_height
+        return pref_width, pref_width
 
     @staticmethod
     def data_is_file(data):
         """Test the file to see if it's a filename or not"""
         return isinstance(data, str) and "<svg" not in data
 
-    def load_file_from_path(self, path: str, scale):
-        img_format, width, height = GdkPixbuf.Pixbuf.get_file_info(path)
-        pixbuf: GdkPixbuf.Pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(path, width * scale, height * scale)
-        return pixbuf
+    def rasterise(self, source, size) -> tuple[GdkPixbuf.Pixbuf, tuple[int, int]]:
+        """
+        Decodes an image file, or its data for files in memory, at size(width, height) of the image.
+        Returns the pixbuf and the size of the image it was made from
+        """
+        if isinstance(source, bytes):
+            loader = GdkPixbuf.PixbufLoader()
+            source_size = []
+
+            def size_prepared(loader, width, height):
+                source_size.extend((width, height))
+                loader.set_size(*size(width, height))
+
+            loader.connect("size-prepared", size_prepared)
+            loader.write(source)
+            loader.close()
+            return loader.get_pixbuf(), tuple(source_size)
+
+        img_format, width, height = GdkPixbuf.Pixbuf.get_file_info(source)
+        return GdkPixbuf.Pixbuf.new_from_file_at_scale(source, *size(width, height), False), (width, height)
+
+    def load_image(self, source, scale, geometry=None) -> GdkPixbuf.Pixbuf:
+        """
+        Loads an image file (or its data) at `scale`, or with geometry(width, height) of the scaled
+        image returning the RenderGeometry it's rasterised and cropped with
+        """
+        layouts = []
+
+        def size(width, height):
+            width, height = scaled_size(width, height, scale)
+            if geometry:
+                layouts.append(geometry(width, height))
+                return layouts[0].size
+            return width, height
+
+        img, _ = self.rasterise(source, size)
+        if layouts:
+            return layouts[0].apply(img)
+        return img
 
     def get_pixmap_path(self, name):
         """Returns the pixmap path based on stored location"""
@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from gi.repository import GdkPixbuf
+
+BILINEAR = GdkPixbuf.InterpType.BILINEAR
+HYPER = GdkPixbuf.InterpType.HYPER
+
+# full, large, medium and small
+LEVELS = 4
+# memory budget for the pyramids of recently shown files
+MEMORY_BUDGET = 96 * 1024 * 1024
+
+
+def pixbuf_bytes(pixbuf: GdkPixbuf.Pixbuf) -> int:
+    return pixbuf.get_rowstride() * pixbuf.get_height()
+
+
+class ThumbnailPyramid:
+    """
+    An image at full size and halved down to large, medium and small, like the mip levels of a texture.
+    A level is made from the one above it the first time it's needed, and views scale the nearest
+    level at least as big as they want instead of decoding the source again.
+    """
+
+    def __init__(self, full: GdkPixbuf.Pixbuf, source_size=None):
+        # size of the image the full level was rasterised from
+        self.source_size = source_size or (full.get_width(), full.get_height())
+        self.levels: list[Optional[GdkPixbuf.Pixbuf]] = [full] + [None] * (LEVELS - 1)
+        self._lock = threading.Lock()
+
+    @property
+    def full(self) -> GdkPixbuf.Pixbuf:
+        return self.levels[0]
+
+    @property
+    def bytes(self) -> int:
+        return sum(pixbuf_bytes(level) for level in self.levels if level)
+
+    def level(self, index) -> GdkPixbuf.Pixbuf:
+        with self._lock:
+            return self._make_level(index)
+
+    def _make_level(self, index) -> GdkPixbuf.Pixbuf:
+        if self.levels[index] is None:
+            above = self._make_level(index - 1)
+            self.levels[index] = above.scale_simple(max(1, above.get_width() // 2),
+                                                    max(1, above.get_height() // 2), HYPER)
+        return self.levels[index]
+
+    def nearest(self, width, height) -> GdkPixbuf.Pixbuf:
+        """Returns the smallest level that's at least `width` x `height`, the full level if none is"""
+        full_w, full_h = self.full.get_width(), self.full.get_height()
+        index = 0
+        while index + 1 < LEVELS and full_w >> (index + 1) >= width and full_h >> (index + 1) >= height:
+            index += 1
+        return self.level(index)
+
+    def scaled(self, width, height, interp=BILINEAR) -> GdkPixbuf.Pixbuf:
+        level = self.nearest(width, height)
+        if (level.get_width(), level.get_height()) == (width, height):
+            return level
+        return level.scale_simple(width, height, interp)
+
+
+class PyramidCache:
+    """Pyramids of recently rendered files, least recently used first out past `max_bytes`"""
+
+    def __init__(self, max_bytes=MEMORY_BUDGET):
+        self.max_bytes = max_bytes
+        self._pyramids: OrderedDict[str, ThumbnailPyramid] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[ThumbnailPyramid]:
+        with self._lock:
+            pyramid = self._pyramids.get(key)
+            if pyramid:
+                self._pyramids.move_to_end(key)
+            return pyramid
+
+    def get_or_make(self, key, make: Callable[[], Optional[ThumbnailPyramid]]) -> Optional[ThumbnailPyramid]:
+        pyramid = self.get(key)
+        if pyramid:
+            return pyramid
+        pyramid = make()
+        if pyramid and pyramid.bytes <= self.max_bytes:
+            with self._lock:
+                pyramid = self._pyramids.setdefault(key, pyramid)
+                self._pyramids.move_to_end(key)
+                self._trim()
+        return pyramid
+
+    def _trim(self):
+        # levels are added after a pyramid is stored, so the total is worked out when trimming
+        total = sum(pyramid.bytes for pyramid in self._pyramids.values())
+        while total > self.max_bytes and len(self._pyramids) > 1:
+            _, evicted = self._pyramids.popitem(last=False)
+            total -= evicted.bytes
+
+    def clear(self):
+        with self._lock:
+            self._pyramids.clear()
+
+
+# shared by all pixmap managers, keyed like the render cache
+pyramid_cache = PyramidCache()
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from gi.repository import GdkPixbuf, GLib
+
+from core.cache_manager import cache_manager
+
+# memory budget for decoded thumbnails kept around for reuse
+MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+def save_png(pixbuf: GdkPixbuf.Pixbuf, path) -> str:
+    """Saves a render, safe to call for the same path from several threads or processes"""
+    # write to a temporary name first so a half written png is never picked up
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pixbuf.savev(tmp_path, "png", [], [])
+    os.replace(tmp_path, path)
+    return path
+
+
+class RenderCache:
+    """
+    Content addressed cache of rendered thumbnails.
+
+    Renders are keyed on a hash of the source file, the display type, the pixmap manager's
+    scale/padding/aspect settings and the active tasks, so a render is reused for as long as
+    none of those change. Decoded pixbufs are kept in memory up to `max_bytes` (least recently
+    used first out), which is where thumbnails are painted from. Renders of thumbnails backed by
+    files are also saved as a png in `renders_dir` so they outlive the session, renders of
+    thumbnails in memory are only kept in memory.
+    """
+
+    def __init__(self, renders_dir, max_bytes=MEMORY_BUDGET):
+        self.renders_dir = renders_dir
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._pixbufs: OrderedDict[str, GdkPixbuf.Pixbuf] = OrderedDict()
+        self._hashes: dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def file_hash(self, path) -> Optional[str]:
+        """Returns a hash of the file's content, only rereading it once it has been modified"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._hashes.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        with self._lock:
+            self._hashes[path] = (signature, content_hash)
+        return content_hash
+
+    def make_key(self, source_path, *parts) -> Optional[str]:
+        """Returns the key of a render of `source_path`, None if the file can't be read"""
+        content_hash = self.file_hash(source_path)
+        if not content_hash:
+            return None
+        return hashlib.blake2b(repr((content_hash, *parts)).encode(), digest_size=16).hexdigest()
+
+    def make_data_key(self, data: bytes, *parts) -> str:
+        """Like make_key for a thumbnail that's in memory instead of in a file"""
+        content_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return hashlib.blake2b(repr((content_hash, *parts)).encode(), digest_size=16).hexdigest()
+
+    def get_path(self, key) -> str:
+        return os.path.join(self.renders_dir, f"{key}.png")
+
+    def has_render(self, key) -> bool:
+        with self._lock:
+            if key in self._pixbufs:
+                return True
+        return os.path.isfile(self.get_path(key))
+
+    def get_pixbuf(self, key) -> Optional[GdkPixbuf.Pixbuf]:
+        with self._lock:
+            pixbuf = self._pixbufs.get(key)
+            if pixbuf:
+                self._pixbufs.move_to_end(key)
+                return pixbuf
+        path = self.get_path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file(path)
+        except GLib.Error:
+            return None
+        self._remember(key, pixbuf)
+        return pixbuf
+
+    def get_file(self, key) -> Optional[str]:
+        """Returns the saved png of a render, saving it first if it only exists in memory"""
+        path = self.get_path(key)
+        if os.path.isfile(path):
+            return path
+        with self._lock:
+            pixbuf = self._pixbufs.get(key)
+        if pixbuf:
+            return self._save(key, pixbuf)
+        return None
+
+    def put(self, key, pixbuf: GdkPixbuf.Pixbuf, save=True) -> str:
+        """Stores a render and returns the path of its png"""
+        self._remember(key, pixbuf)
+        if save:
+            return self._save(key, pixbuf)
+        return self.get_path(key)
+
+    def _save(self, key, pixbuf: GdkPixbuf.Pixbuf) -> str:
+        os.makedirs(self.renders_dir, exist_ok=True)
+        return save_png(pixbuf, self.get_path(key))
+
+    def _remember(self, key, pixbuf: GdkPixbuf.Pixbuf):
+        size = pixbuf.get_rowstride() * pixbuf.get_height()
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._pixbufs.pop(key, None)
+            if old:
+                self.bytes -= old.get_rowstride() * old.get_height()
+            self._pixbufs[key] = pixbuf
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._pixbufs.popitem(last=False)
+                self.bytes -= evicted.get_rowstride() * evicted.get_height()
+
+    def clear_memory(self):
+        with self._lock:
+            self._pixbufs.clear()
+            self.bytes = 0
+
+
+# shared by all pixmap managers, keys are content addressed so sources can't collide
+render_cache = RenderCache(cache_manager.category_dir("renders"))
@@ -0,0 +1,153 @@
+import math
+import re
+from typing import Optional
+
+import cairo
+from gi.repository import Gdk, GdkPixbuf, Gtk
+
+# the rule styling each thumbnail in a pixmap manager's style template
+ITEM_RULE = re.compile(r"\.\{id\}\s*\{\{(.*?)\}\}", re.DOTALL)
+LENGTH = re.compile(r"([\d.]+)\s*(%|px)?")
+
+_screen_styles = set()
+
+
+def install_screen_style(css):
+    """Adds css shared by every thumbnail to the screen, once"""
+    if not css or not css.strip() or css in _screen_styles:
+        return
+    _screen_styles.add(css)
+    provider = Gtk.CssProvider()
+    provider.load_from_data(bytes(css, "utf8"))
+    Gtk.StyleContext.add_provider_for_screen(Gdk.Screen.get_default(), provider,
+                                             Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+
+
+class ThumbnailStyle:
+    """
+    How a thumbnail is painted: scaled to cover or fit (contain) its widget, on a background
+    colour, with rounded corners. Read from the `.{id}` rule of a pixmap manager's css template,
+    any other rule of the template is kept in `screen_css`.
+    """
+
+    def __init__(self, fit="cover", background: Optional[Gdk.RGBA] = None, radius=(0.0, None),
+                 screen_css="", template=None):
+        self.fit = fit
+        self.background = background
+        # (value, "%" or "px")
+        self.radius = radius
+        self.screen_css = screen_css
+        self.template = template
+
+    @classmethod
+    def from_css(cls, template: str) -> "ThumbnailStyle":
+        match = ITEM_RULE.search(template)
+        declarations = {}
+        if match:
+            for declaration in match.group(1).split(";"):
+                name, _, value = declaration.partition(":")
+                if value:
+                    declarations[name.strip()] = value.strip()
+            screen_css = template[:match.start()] + template[match.end():]
+        else:
+            screen_css = template
+        screen_css = screen_css.replace("{{", "{").replace("}}", "}")
+
+        fit = declarations.get("background-size", "auto")
+        background = None
+        if "background-color" in declarations:
+            background = Gdk.RGBA()
+            if not background.parse(declarations["background-color"]):
+                background = None
+        radius = (0.0, None)
+        length = LENGTH.match(declarations.get("border-radius", ""))
+        if length:
+            radius = (float(length.group(1)), length.group(2) or "px")
+        return cls(fit, background, radius, screen_css, template)
+
+    def corner_radii(self, width, height) -> tuple[float, float]:
+        value, unit = self.radius
+        if unit == "%":
+            return width * value / 100, height * value / 100
+        return value, value
+
+
+def rounded_rectangle(cr: cairo.Context, x, y, width, height, rx, ry):
+    rx, ry = min(rx, width / 2), min(ry, height / 2)
+    if rx <= 0 or ry <= 0:
+        cr.rectangle(x, y, width, height)
+        return
+    corners = ((x + width - rx, y + ry, -math.pi / 2), (x + width - rx, y + height - ry, 0),
+               (x + rx, y + height - ry, math.pi / 2), (x + rx, y + ry, math.pi))
+    cr.new_sub_path()
+    for cx, cy, start in corners:
+        cr.save()
+        cr.translate(cx, cy)
+        cr.scale(rx, ry)
+        cr.arc(0, 0, 1, start, start + math.pi / 2)
+        cr.restore()
+    cr.close_path()
+
+
+def paint_thumbnail(widget: Gtk.Widget, cr: cairo.Context, pixbuf: GdkPixbuf.Pixbuf, style: ThumbnailStyle):
+    width, height = widget.get_allocated_width(), widget.get_allocated_height()
+    padding = widget.get_style_context().get_padding(widget.get_state_flags())
+    # the image goes in the content box, like background-origin: content-box
+    x, y = padding.left, padding.top
+    content_width = width - padding.left - padding.right
+    content_height = height - padding.top - padding.bottom
+    if content_width <= 0 or content_height <= 0:
+        return
+
+    cr.save()
+    rounded_rectangle(cr, 0, 0, width, height, *style.corner_radii(width, height))
+    cr.clip()
+    if style.background:
+        Gdk.cairo_set_source_rgba(cr, style.background)
+        cr.paint()
+
+    image_width, image_height = pixbuf.get_width(), pixbuf.get_height()
+    if style.fit == "cover":
+        scale = max(content_width / image_width, content_height / image_height)
+    elif style.fit == "contain":
+        scale = min(content_width / image_width, content_height / image_height)
+    else:
+        scale = 1
+    cr.rectangle(x, y, content_width, content_height)
+    cr.clip()
+    cr.translate(x + (content_width - image_width * scale) / 2, y + (content_height - image_height * scale) / 2)
+    cr.scale(scale, scale)
+    Gdk.cairo_set_source_pixbuf(cr, pixbuf, 0, 0)
+    cr.get_source().set_filter(cairo.FILTER_GOOD)
+    cr.paint()
+    cr.restore()
+
+
+class Thumbnail:
+    """
+    Paints a pixbuf as the background of a widget, below its children.
+    This replaces a css provider per thumbnail, which Gtk had to take into account
+    for the style of every widget on the screen.
+    """
+
+    def __init__(self, widget: Gtk.Widget):
+        self.widget = widget
+        self.pixbuf: Optional[GdkPixbuf.Pixbuf] = None
+        self.style: Optional[ThumbnailStyle] = None
+        widget.connect("draw", self.on_draw)
+
+    def set_pixbuf(self, pixbuf: Optional[GdkPixbuf.Pixbuf], style: ThumbnailStyle):
+        self.pixbuf = pixbuf
+        self.style = style
+        install_screen_style(style.screen_css)
+        self.widget.queue_draw()
+
+    def clear(self):
+        if self.pixbuf:
+            self.pixbuf = None
+            self.widget.queue_draw()
+
+    def on_draw(self, widget, cr):
+        if self.pixbuf and self.style:
+            paint_thumbnail(widget, cr, self.pixbuf, self.style)
+        return False
@@ -1,28 +1,17 @@
-import asyncio
-import inspect
 import os
-import shutil
-from asyncio import Queue
-from pathlib import Path
-from threading import Thread
 
-import requests
 from gi.repository import Gtk
 
-from core.constants import CACHE_DIR
-from core.network.adapter import FileAdapter
+from core.export_engine import BatchSink, BulkExporter, ExportItem, ExportProgress, FolderSink, ZipSink, \
+    unique_arcname
+from core.network import session
+from core.runtime import runtime
 from core.utils import asyncme
 from sources.source import RemoteSource, SourceType
-from sources.source_file import RemoteFile
 from windows.import_window import ImportWindow, ImportItem
 from windows.options_window import OptionsWindow, OptionType, OptionsChangeListener
 
 
-async def apply_tasks_to_file(file: RemoteFile, file_path: str):
-    for task in file.tasks:
-        await task.do_task(file_path)
-
-
 class ImportManager(OptionsChangeListener):
     name = "import_manager"
     window_cls = ImportWindow
@@ -36,47 +25,18 @@ class ImportManager(OptionsChangeListener):
         self.ink_ext = self.ink_window.gapp.ext
         self.files_saved: dict[RemoteSource, set] = {}
         self.files: dict[RemoteSource, set] = {}
-        self.session = requests.session()
-        self.session.mount('file://', FileAdapter())
-
-        headers = {
-            "user-agent": "InkStock"
-        }
-        self.session.headers.update(headers)
+        # shares the sources' connection pool but skips the http cache
+        self.session = session.get_session(cached=False)
 
         # ====== Options Window ========= #
         self.options_window = OptionsWindow(self)
         self.options_window.set_option("sources", "Sources to import from", OptionType.TEXTVIEW)
 
-        # start async tasks queue in background thread
-        self.download_task_queue: Queue = None
-        self.download_task_loop = asyncio.new_event_loop()
-        task_thread = Thread(target=self.start_background_loop, daemon=True)
-        task_thread.start()
-        while not self.download_task_loop.is_running():
-            pass  # simply waiting loop to start
-
-    def start_background_loop(self) -> None:
-        asyncio.set_event_loop(self.download_task_loop)
-        self.download_task_queue = Queue()
-        self.download_task_loop.run_until_complete(self.consume_task())
+        # exports run one at a time on the shared background loop
+        self.tasks = runtime.namespace(self.name, max_concurrent=1)
 
     def add_task_to_queue(self, fn, callback, *args, **kwargs):
-        asyncio.run_coroutine_threadsafe(self.download_task_queue.put((fn, callback, args, kwargs)),
-                                         loop=self.download_task_loop)
-
-    async def consume_task(self):
-        while True:
-            fn, callback, args, kwargs = await self.download_task_queue.get()
-            try:
-                if inspect.iscoroutinefunction(fn):
-                    result = await fn(*args, **kwargs)
-                else:
-                    result = fn(*args, **kwargs)
-                callback(result=result, error=None)
-            except Exception as err:
-                callback(result=None, error=err)
-            self.download_task_queue.task_done()
+        self.tasks.add(fn, callback, *args, **kwargs)
 
     def show_window(self):
         # Merge saved files and temporarily selected files together
@@ -203,17 +163,12 @@ class ImportManager(OptionsChangeListener):
                 print(f"Error occurred during download: {error}")
 
             self.set_window_sensitive(True)
-            asyncme.mainloop_only(self.ink_window.progress.hide)()
+            asyncme.mainloop_post(self.ink_window.progress.hide)()
 
         self.add_task_to_queue(self.save_to_folder, cb, filename)
 
     async def save_to_folder(self, folder_path):
-        for source, files in self.sources.items():
-            path = os.path.join(folder_path, source.source_type.value)
-            if not os.path.exists(path):
-                os.makedirs(path)
-            for file in files:
-                await self.download(file, os.path.join(path, file.file_name))
+        await self.export(self.export_items(), FolderSink(folder_path))
 
     def show_zip_dialog(self, name):
         dialog = Gtk.FileChooserDialog(
@@ -247,26 +202,17 @@ class ImportManager(OptionsChangeListener):
                 print(f"Error occurred during download: {error}")
 
             self.set_window_sensitive(True)
-            asyncme.mainloop_only(self.ink_window.progress.hide)()
+            asyncme.mainloop_post(self.ink_window.progress.hide)()
 
         self.add_task_to_queue(self.import_zip, cb, filename)
 
     async def import_zip(self, save_filename):
-        basename = Path(save_filename).stem
-        temp_dir = os.path.join(CACHE_DIR, basename)
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-        for source, files in self.sources.items():
-            path = os.path.join(temp_dir, source.source_type.value)
-            if not os.path.exists(path):
-                os.makedirs(path)
-            for file in files:
-                await self.download(file, os.path.join(path, file.file_name))
-        save_dir = os.path.dirname(save_filename)
-        shutil.make_archive(os.path.join(save_dir, basename), "zip", root_dir=temp_dir)
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        # the save dialog gives the name as typed, the archive always gets a .zip extension
+        if os.path.splitext(save_filename)[1].lower() != ".zip":
+            save_filename += ".zip"
+        await self.export(self.export_items(), ZipSink(save_filename))
 
-    @asyncme.mainloop_only
+    @asyncme.mainloop_post
     def set_window_sensitive(self, sensitive: bool):
         if sensitive:
             self.window.window.set_sensitive(True)
@@ -275,33 +221,32 @@ class ImportManager(OptionsChangeListener):
             self.window.window.set_sensitive(False)
             self.window.window.set_opacity(0.5)
 
-    async def download(self, file, file_path):
-        url = file.get_file()
-        name = os.path.basename(file_path)
-        bytes_downloaded = 0
-        with open(file_path, mode="wb") as out:
-            with self.session.get(url, stream=True) as r:
-                total = r.headers.get("content-length")
-                total = int(total) if total else None
-                for data in r.iter_content(chunk_size=5000):
-                    bytes_downloaded += len(data)
-                    out.write(data)
-                    self.show_progress(bytes_downloaded, total, name)
-
-        await apply_tasks_to_file(file, file_path)
-
-    @asyncme.mainloop_only
-    def show_progress(self, bytes_downloaded, total, name):
+    def export_items(self, skip_types=()) -> list[ExportItem]:
+        """Lists every file to export, each under a folder named after its source type"""
+        items = []
+        taken = set()
+        for source, files in self.sources.items():
+            if source.source_type in skip_types:
+                continue
+            for file in files:
+                arcname = unique_arcname(os.path.join(source.source_type.value, file.file_name), taken)
+                items.append(ExportItem(source, file, arcname))
+        return items
+
+    async def export(self, items, sink):
+        exporter = BulkExporter(self.session, on_progress=self.show_progress)
+        failed = await exporter.export(items, sink)
+        for item, error in failed:
+            print(f"Error occurred while exporting {item.file.file_name}: {error}")
+
+    @asyncme.mainloop_latest
+    def show_progress(self, progress: ExportProgress):
         self.ink_window.progress.show()
-        if total:
-            percent = bytes_downloaded / total
-            self.ink_window.progress.set_show_text(True)
-            self.ink_window.progress.set_text(f"Fetching {name}...")
-            self.ink_window.progress.set_fraction(percent)
-        else:
-            self.ink_window.progress.set_show_text(True)
-            self.ink_window.progress.set_text(f"Fetching {name}...")
-            self.ink_window.progress.pulse()
+        self.ink_window.progress.set_show_text(True)
+        done = progress.done_items + progress.failed_items
+        megabytes = progress.bytes_downloaded / (1024 * 1024)
+        self.ink_window.progress.set_text(f"Fetched {done} of {progress.total_items} files ({megabytes:.1f} MB)")
+        self.ink_window.progress.set_fraction(progress.fraction)
 
     def import_all(self, name):
         self.set_window_sensitive(False)
@@ -310,24 +255,12 @@ class ImportManager(OptionsChangeListener):
             if error:
                 print(f"Error occurred during import: {error}")
             self.set_window_sensitive(True)
-            asyncme.mainloop_only(self.ink_window.progress.hide)()
+            asyncme.mainloop_post(self.ink_window.progress.hide)()
 
         self.add_task_to_queue(self.import_into_inkscape, cb)
 
     async def import_into_inkscape(self):
-        import_temp_dir = os.path.join(CACHE_DIR, "import_tmp")
-        if os.path.exists(import_temp_dir):
-            shutil.rmtree(import_temp_dir)
-        for source, files in self.sources.items():
-            # importing font into Inkscape not supported yet
-            if source.source_type == SourceType.FONT:
-                continue
-            path = os.path.join(import_temp_dir, source.source_type.value)
-            if not os.path.exists(path):
-                os.makedirs(path)
-            for file in files:
-                file_to_import = os.path.join(path, file.file_name)
-                await self.download(file, file_to_import)
-                self.show_progress(None, None, f" Importing {file.file_name}...")
-                self.ink_ext.import_from_file(file_to_import)
-            shutil.rmtree(import_temp_dir, ignore_errors=True)
+        # importing font into Inkscape not supported yet
+        items = self.export_items(skip_types=(SourceType.FONT,))
+        # files are imported together once they're all downloaded, merging them into the document in one pass
+        await self.export(items, BatchSink(lambda items, file_paths: self.ink_ext.import_files(file_paths)))
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Optional
+
+import aiohttp
+
+from core.cache_manager import cache_manager
+from core.runtime import runtime
+
+# responses without cache headers are kept this long, like the ExpiresAfter(days=1) of the requests cache
+DEFAULT_MAX_AGE = 24 * 60 * 60
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class AsyncResponse:
+    """The parts of a response sources care about, read completely
+    so it can be handed between event loops"""
+
+    def __init__(self, url, status, headers, content: bytes, from_cache=False):
+        self.url = url
+        self.status_code = status
+        self.headers = headers
+        self.content = content
+        self.from_cache = from_cache
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HttpCache:
+    """
+    Responses to GET requests of the async session, kept on disk next to the requests cache.
+
+    A response is fresh for the max-age of its Cache-Control header, or a day if it has none,
+    and isn't kept at all with no-store. Stale responses with an ETag or Last-Modified are
+    revalidated and reused if the server answers 304. Each response is one file, a line of
+    json with its url, headers and expiry followed by the body.
+    """
+
+    def __init__(self, cache_dir=None):
+        self._cache_dir = cache_dir
+
+    @property
+    def cache_dir(self) -> str:
+        if self._cache_dir is None:
+            self._cache_dir = os.path.join(cache_manager.category_dir("http"), "async")
+        return self._cache_dir
+
+    @staticmethod
+    def key(url, params=None) -> str:
+        return hashlib.blake2b(repr((url, sorted((params or {}).items()))).encode(), digest_size=16).hexdigest()
+
+    def get_path(self, key) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key) -> Optional[tuple[dict, bytes]]:
+        """Returns (metadata, body) of a cached response, None if there's none. Blocks"""
+        try:
+            with open(self.get_path(key), "rb") as f:
+                meta = json.loads(f.readline())
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key, response: "AsyncResponse"):
+        """Keeps a response if its headers allow it. Blocks"""
+        max_age = self.max_age(response.headers)
+        if max_age is None:
+            return
+        meta = {"url": response.url, "headers": response.headers, "expires": time.time() + max_age}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(key)
+        # write to a temporary name first so a half written response is never read
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(meta).encode() + b"\n")
+            f.write(response.content)
+        os.replace(tmp_path, path)
+
+    def refresh(self, key, meta: dict, headers: dict):
+        """Keeps a revalidated response for another max-age. Blocks"""
+        _, body = self.load(key) or (None, None)
+        if body is None:
+            return
+        self.store(key, AsyncResponse(meta["url"], 200, {**meta["headers"], **headers}, body))
+
+    @staticmethod
+    def max_age(headers) -> Optional[int]:
+        cache_control = next((value for name, value in headers.items() if name.lower() == "cache-control"), "")
+        cache_control = cache_control.lower()
+        if "no-store" in cache_control:
+            return None
+        match = MAX_AGE.search(cache_control)
+        return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+    @staticmethod
+    def validators(meta: dict) -> dict:
+        """Conditional request headers to revalidate a stale response"""
+        headers = {name.lower(): value for name, value in meta["headers"].items()}
+        validators = {}
+        if "etag" in headers:
+            validators["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            validators["If-Modified-Since"] = headers["last-modified"]
+        return validators
+
+
+class AsyncSession:
+    """
+    An aiohttp backed http session shared by all sources.
+
+    aiohttp sessions are bound to the event loop they were created in, so the session
+    lives in the app's shared runtime loop, which is also where sources run their jobs.
+    Requests awaited from any other loop are forwarded to it. This way every source shares
+    the same connection pool and keep-alive connections, and many requests can be in flight
+    at the same time. GET requests go through an http cache on disk, see `HttpCache`.
+    """
+
+    def __init__(self, limit=64, limit_per_host=8, keepalive_timeout=30, timeout=30, cache: HttpCache = None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.headers = {"User-Agent": "InkStock"}
+        self.cache = cache or HttpCache()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # only ever called from inside the session's loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def _request(self, method, url, params=None, headers=None, data=None) -> AsyncResponse:
+        session = self._get_session()
+        async with session.request(method, url, params=params, headers=headers, data=data) as resp:
+            content = await resp.read()
+            return AsyncResponse(str(resp.url), resp.status, dict(resp.headers), content)
+
+    async def _cached_get(self, url, params=None, headers=None) -> AsyncResponse:
+        # the cache is on disk, it's read and written in the runtime's worker threads
+        key = self.cache.key(url, params)
+        cached = await runtime.run_blocking(self.cache.load, key)
+        if cached:
+            meta, body = cached
+            if meta["expires"] > time.time():
+                return AsyncResponse(meta["url"], 200, meta["headers"], body, from_cache=True)
+            validators = self.cache.validators(meta)
+            if validators:
+                resp = await self._request("GET", url, params=params, headers={**(headers or {}), **validators})
+                if resp.status_code == 304:
+                    await runtime.run_blocking(self.cache.refresh, key, meta, resp.headers)
+                    return AsyncResponse(meta["url"], 200, meta["headers"], body, from_cache=True)
+                if resp.status_code == 200:
+                    await runtime.run_blocking(self.cache.store, key, resp)
+                return resp
+
+        resp = await self._request("GET", url, params=params, headers=headers)
+        if resp.status_code == 200:
+            await runtime.run_blocking(self.cache.store, key, resp)
+        return resp
+
+    async def request(self, method, url, params=None, headers=None, data=None, cached=True) -> AsyncResponse:
+        """Performs a request and returns the response once it has been read completely.
+        GET requests are answered from the http cache unless `cached` is False.
+        Can be awaited from any event loop"""
+        if method == "GET" and cached and data is None:
+            coro = self._cached_get(url, params=params, headers=headers)
+        else:
+            coro = self._request(method, url, params=params, headers=headers, data=data)
+        if runtime.in_loop():
+            return await coro
+        return await asyncio.wrap_future(runtime.submit(coro))
+
+    async def get(self, url, params=None, headers=None, cached=True) -> AsyncResponse:
+        return await self.request("GET", url, params=params, headers=headers, cached=cached)
+
+    async def head(self, url, headers=None) -> AsyncResponse:
+        return await self.request("HEAD", url, headers=headers)
+
+    async def get_json(self, url, params=None, headers=None):
+        response = await self.get(url, params=params, headers=headers)
+        return response.json()
+
+    def close(self):
+        if self._session:
+            runtime.submit(self._session.close()).result()
+
+
+# session shared by all sources
+session = AsyncSession()
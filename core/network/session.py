@@ -0,0 +1,130 @@
+import threading
+
+import requests
+from cachecontrol import CacheControlAdapter
+from cachecontrol.caches.file_cache import FileCache
+from cachecontrol.heuristics import ExpiresAfter
+from requests.adapters import HTTPAdapter
+
+from core.cache_manager import cache_manager
+from core.network.adapter import FileAdapter
+
+# number of hosts we keep a connection pool for
+POOL_HOSTS = 32
+# maximum number of open connections to a single host
+POOL_PER_HOST = 8
+
+
+class TransportStats:
+    """Counts cache hits and connection usage of the shared transport"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = set()
+        self.cache_hits = 0
+
+    def track_pool(self, pool):
+        with self._lock:
+            self._pools.add(pool)
+
+    def count_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def as_dict(self):
+        with self._lock:
+            pools = list(self._pools)
+            cache_hits = self.cache_hits
+        # urllib3 pools count every connection they open and every request sent through them,
+        # any request that didn't need a new connection reused a kept-alive one
+        new_connections = sum(pool.num_connections for pool in pools)
+        requests_sent = sum(pool.num_requests for pool in pools)
+        return {
+            "hosts": len(pools),
+            "cache_hits": cache_hits,
+            "requests": requests_sent,
+            "new_connections": new_connections,
+            "reuses": max(requests_sent - new_connections, 0),
+        }
+
+
+class StatsAdapterMixin:
+    stats: TransportStats = None
+
+    def send(self, request, **kwargs):
+        self.stats.track_pool(self.get_connection(request.url, kwargs.get("proxies")))
+        response = super().send(request, **kwargs)
+        if getattr(response, "from_cache", False):
+            self.stats.count_cache_hit()
+        return response
+
+
+class PooledCacheAdapter(StatsAdapterMixin, CacheControlAdapter):
+    pass
+
+
+class PooledAdapter(StatsAdapterMixin, HTTPAdapter):
+    pass
+
+
+class SharedTransport:
+    """
+    One connection pool and http cache for the whole process.
+
+    Sources used to mount their own CacheControl adapter on their own session, so every
+    source had separate connection pools even when they talk to the same hosts
+    (raw.githubusercontent.com serves most of the icon sets). Both sessions handed out
+    here share the same urllib3 pool manager, the cached one is used by sources and the
+    uncached one by the import manager, whose full size downloads shouldn't fill the cache.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.stats = TransportStats()
+
+        cached_adapter = PooledCacheAdapter(
+            cache=FileCache(cache_dir or cache_manager.category_dir("http")),
+            heuristic=ExpiresAfter(days=1),
+            pool_connections=POOL_HOSTS,
+            pool_maxsize=POOL_PER_HOST,
+            pool_block=True,
+        )
+        cached_adapter.stats = self.stats
+
+        plain_adapter = PooledAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_PER_HOST, pool_block=True)
+        plain_adapter.poolmanager = cached_adapter.poolmanager
+        plain_adapter.stats = self.stats
+
+        self.cached_session = self._new_session(cached_adapter)
+        self.session = self._new_session(plain_adapter)
+
+    @staticmethod
+    def _new_session(adapter):
+        session = requests.session()
+        session.headers.update({"User-Agent": "InkStock"})
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.mount("file://", FileAdapter())
+        return session
+
+
+_transport = None
+_lock = threading.Lock()
+
+
+def get_transport() -> SharedTransport:
+    global _transport
+    with _lock:
+        if _transport is None:
+            _transport = SharedTransport()
+    return _transport
+
+
+def get_session(cached=True) -> requests.Session:
+    """Returns the process wide session, with or without the http cache"""
+    transport = get_transport()
+    return transport.cached_session if cached else transport.session
+
+
+def get_stats() -> dict:
+    """Returns cache hits, new connections and connection reuses of the shared transport"""
+    return get_transport().stats.as_dict()
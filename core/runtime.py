@@ -0,0 +1,121 @@
+import asyncio
+import inspect
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+# threads shared by every blocking job (requests, file io, rendering...) of every source
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+class Runtime:
+    """
+    The background event loop and thread pool shared by the whole app.
+
+    The loop runs in a single daemon thread, started the first time it's needed, and
+    blocking calls made from it go to one thread pool of `max_workers` threads. Sources
+    and the import manager each get a `TaskNamespace` on it, instead of a loop and a
+    thread of their own.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, name="InkStockRuntime"):
+        self.max_workers = max_workers
+        self.name = name
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self.start()
+        return self._loop
+
+    def start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.name}Worker")
+            loop.set_default_executor(self.executor)
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            threading.Thread(target=run, daemon=True, name=self.name).start()
+            # waits without spinning until the loop is running
+            ready.wait()
+            self._loop = loop
+
+    def in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def submit(self, coro) -> Future:
+        """Schedules a coroutine on the loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, fn, *args):
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def run_in_thread(self, fn, *args, **kwargs) -> Future:
+        """Runs a blocking function in the shared thread pool from any thread, without going through the loop"""
+        if self.executor is None:
+            self.start()
+        return self.executor.submit(fn, *args, **kwargs)
+
+    async def run_blocking(self, fn, *args, **kwargs):
+        """Runs a blocking function in the shared thread pool and waits for its result"""
+        return await asyncio.get_running_loop().run_in_executor(None, partial(fn, *args, **kwargs))
+
+    def namespace(self, name, max_concurrent=4) -> "TaskNamespace":
+        return TaskNamespace(self, name, max_concurrent)
+
+
+class TaskNamespace:
+    """
+    Background jobs of one owner (a source, the import manager) on the shared runtime.
+    Jobs start in the order they were added, at most `max_concurrent` of them running at the
+    same time, and the callback gets callback(result=..., error=...) once a job is done.
+    """
+
+    def __init__(self, runtime: Runtime, name, max_concurrent=4):
+        self.runtime = runtime
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def add(self, fn, callback, *args, cancel_token=None, **kwargs):
+        """Queues fn(*args, **kwargs), it's skipped if `cancel_token` is cancelled by the time it would start"""
+        self.runtime.call_soon(self._schedule, fn, callback, args, kwargs, cancel_token)
+
+    def _schedule(self, fn, callback, args, kwargs, cancel_token):
+        asyncio.ensure_future(self._run(fn, callback, args, kwargs, cancel_token))
+
+    async def _run(self, fn, callback, args, kwargs, cancel_token):
+        if self._semaphore is None:
+            # made in the loop's thread, asyncio primitives are bound to the loop they're used in
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        async with self._semaphore:
+            if cancel_token and cancel_token.cancelled:
+                return
+            try:
+                if inspect.iscoroutinefunction(fn):
+                    result = await fn(*args, **kwargs)
+                else:
+                    result = await self.runtime.run_blocking(fn, *args, **kwargs)
+            except Exception as err:
+                callback(result=None, error=err)
+            else:
+                callback(result=result, error=None)
+
+
+# runtime shared by all sources
+runtime = Runtime()
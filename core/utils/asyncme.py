@@ -35,8 +35,12 @@ function. For example, in the call::
 the blocking argument to holding might otherwise conflict with the
 blocking argument to run_task.
 """
+import atexit
+import os
 import time
 import threading
+import traceback
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 
 from functools import wraps
@@ -219,6 +223,26 @@ class DebouncedSyncVar:
         self._cv.notify()
 
 
+class CancelToken:
+    """Marks a group of jobs as no longer wanted
+
+    Jobs are handed the token that was current when they were queued and check
+    :func:`cancelled` before (and between) their expensive steps. Cancelling is
+    one way, once the jobs of a token are unwanted a new token is made for the
+    next ones.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
 def spawn_thread(func):
     """Call ``func()`` in a separate thread
 
@@ -272,6 +296,150 @@ def mainloop_only(f):
     return wrapper
 
 
+# longest a main loop callback should take, one frame at 60 fps
+FRAME_TIME = 0.016
+
+
+class FrameTimes:
+    """Durations of the last ``size`` calls run by a :class:`UiDispatcher`
+
+    Anything slower than ``FRAME_TIME`` held up a frame. Set
+    ``INKSTOCK_FRAME_TIMES`` in the environment to print slow calls as they
+    happen and a summary when the app exits.
+    """
+
+    def __init__(self, size=1000, verbose=False):
+        self.durations = deque(maxlen=size)
+        self.verbose = verbose
+        self.count = 0
+        self.slow = 0
+        self.slowest = (0.0, None)
+
+    def record(self, func, seconds):
+        self.durations.append(seconds)
+        self.count += 1
+        if seconds > FRAME_TIME:
+            self.slow += 1
+            if self.verbose:
+                print(f"Slow main loop call: {getattr(func, '__qualname__', func)} took {seconds * 1000:.1f} ms")
+        if seconds > self.slowest[0]:
+            self.slowest = (seconds, getattr(func, "__qualname__", repr(func)))
+
+    def summary(self) -> dict:
+        durations = sorted(self.durations)
+        if not durations:
+            return {"calls": 0, "over_budget": 0}
+        return {
+            "calls": self.count,
+            "over_budget": self.slow,
+            "mean_ms": sum(durations) / len(durations) * 1000,
+            "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000,
+            "max_ms": self.slowest[0] * 1000,
+            "slowest": self.slowest[1],
+        }
+
+    def report(self):
+        summary = self.summary()
+        if not summary["calls"]:
+            return
+        print(f"Main loop calls: {summary['calls']}, over {FRAME_TIME * 1000:.0f} ms: {summary['over_budget']}, "
+              f"mean {summary['mean_ms']:.2f} ms, p95 {summary['p95_ms']:.2f} ms, "
+              f"max {summary['max_ms']:.2f} ms ({summary['slowest']})")
+
+    def reset(self):
+        self.durations.clear()
+        self.count = 0
+        self.slow = 0
+        self.slowest = (0.0, None)
+
+
+class UiDispatcher:
+    """Runs calls posted from any thread in the Gtk main loop, in batches
+
+    Posting never blocks, unlike :func:`mainloop_only`. A single idle handler
+    drains the posted calls in order, until ``frame_budget`` seconds have been
+    spent, then lets Gtk draw a frame before carrying on with the rest. A call
+    posted with a ``key`` replaces the waiting call with the same key (keeping
+    its place), so a stream of progress updates only shows the latest one.
+    How long each call took is kept in ``frame_times``.
+    """
+
+    def __init__(self, frame_budget=0.008):
+        self.frame_budget = frame_budget
+        self.frame_times = FrameTimes(verbose=bool(os.environ.get("INKSTOCK_FRAME_TIMES")))
+        self._lock = threading.Lock()
+        self._calls = OrderedDict()
+        self._scheduled = False
+
+    def post(self, func, *args, key=None, **kwargs):
+        with self._lock:
+            self._calls[object() if key is None else key] = (func, args, kwargs)
+            if not self._scheduled:
+                self._scheduled = True
+                GLib.idle_add(self._drain)
+
+    def discard(self, key):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def _drain(self):
+        deadline = time.monotonic() + self.frame_budget
+        while True:
+            with self._lock:
+                if not self._calls:
+                    self._scheduled = False
+                    return False
+                _, (func, args, kwargs) = self._calls.popitem(last=False)
+            start = time.perf_counter()
+            try:
+                func(*args, **kwargs)
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+            self.frame_times.record(func, time.perf_counter() - start)
+            if time.monotonic() >= deadline:
+                # idle handlers run after redraws, so the next batch waits for the frame
+                return True
+
+
+dispatcher = UiDispatcher()
+if dispatcher.frame_times.verbose:
+    atexit.register(dispatcher.frame_times.report)
+
+
+def mainloop_post(f):
+    """A decorator which posts calls of a function to the Gtk main loop without waiting
+
+    Unlike :func:`mainloop_only` the calling thread carries on straight away,
+    so the decorated function can't return anything. Calls run in the order
+    they were posted, see :class:`UiDispatcher`.
+    """
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if GLib.main_depth():
+            return f(*args, **kwargs)
+        dispatcher.post(f, *args, **kwargs)
+
+    return wrapper
+
+
+def mainloop_latest(f):
+    """Same as :func:`mainloop_post`, but a call still waiting to run is replaced
+    by the next one for the same first argument (the instance, for methods).
+    Meant for progress updates, where only the latest value is worth showing.
+    """
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        key = (f, id(args[0]) if args else None)
+        if GLib.main_depth():
+            dispatcher.discard(key)
+            return f(*args, **kwargs)
+        dispatcher.post(f, *args, key=key, **kwargs)
+
+    return wrapper
+
+
 def holding(lock, task, blocking=True):
     """Run task() while holding ``lock``.
 
@@ -328,3 +496,39 @@ def run_or_none(func):
         return holding(lock, lambda: func(*args, **kwargs), blocking=False)
 
     return _inner
+
+
+def run_latest(func):
+    """A decorator which runs the function in a thread, one call at a time
+
+    Unlike :func:`run_or_none`, a call made while the function is running isn't
+    dropped, it waits for the running one to finish. Only the last waiting call
+    is kept, so the latest arguments always win, e.g. the last typed search query.
+
+    Returns the spawned thread, or None if the call was left waiting.
+    """
+    lock = threading.Lock()
+    state = {"running": False, "waiting": None}
+
+    def _target(call):
+        while call:
+            try:
+                call()
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+            with lock:
+                call, state["waiting"] = state["waiting"], None
+                if not call:
+                    state["running"] = False
+
+    @wraps(func)
+    def _inner(*args, **kwargs):
+        call = lambda: func(*args, **kwargs)
+        with lock:
+            if state["running"]:
+                state["waiting"] = call
+                return None
+            state["running"] = True
+        return spawn_thread(lambda: _target(call))
+
+    return _inner
@@ -0,0 +1,207 @@
+"""
+Packed icon libraries.
+
+The bundled icon sets are json files mapping icon names to svgs (or urls), up to a few MB each,
+which had to be parsed completely before a set could be shown. A pack holds the same mapping in
+a form that is read through mmap, so opening one only reads its header and an icon is only
+decompressed when it is looked up.
+
+Layout, all integers little endian:
+    header      magic, number of icons, mtime and size of the json it was made from
+    entries     per icon (sorted by name): name offset, name length, data offset, data length
+    names       utf-8 names
+    data        zlib compressed utf-8 values
+
+Packs are built next to the json files with:
+    python -m core.utils.icon_pack json/*.json
+otherwise they are built into the cache the first time a set is opened.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from collections.abc import Mapping
+
+MAGIC = b"INKPACK1"
+HEADER = struct.Struct("<8sIdQ")
+ENTRY = struct.Struct("<QIQI")
+
+
+class IconPack(Mapping):
+    """Read only mapping of icon names to values, backed by a pack file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.count, self.source_mtime, self.source_size = HEADER.unpack_from(self._mm, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise ValueError(f"{path} is not an icon pack")
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an icon pack")
+        self._names = None
+
+    def _entry(self, index):
+        return ENTRY.unpack_from(self._mm, HEADER.size + index * ENTRY.size)
+
+    def name(self, index) -> str:
+        name_offset, name_length, _, _ = self._entry(index)
+        return self._mm[name_offset:name_offset + name_length].decode()
+
+    def value(self, index) -> str:
+        _, _, data_offset, data_length = self._entry(index)
+        return zlib.decompress(self._mm[data_offset:data_offset + data_length]).decode()
+
+    def index(self, name) -> int:
+        """Returns the position of `name` found by binary search over the name table, -1 if missing"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.name(mid) < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.name(lo) == name:
+            return lo
+        return -1
+
+    def names(self) -> list[str]:
+        if self._names is None:
+            self._names = [self.name(i) for i in range(self.count)]
+        return self._names
+
+    def __getitem__(self, name):
+        index = self.index(name)
+        if index < 0:
+            raise KeyError(name)
+        return self.value(index)
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __len__(self):
+        return self.count
+
+    def matches(self, source_path, check_mtime=True) -> bool:
+        """Tests if the pack was made from the current version of `source_path`"""
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return True
+        if check_mtime and stat.st_mtime != self.source_mtime:
+            return False
+        return stat.st_size == self.source_size
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def write_pack(icon_map: dict, path, source_mtime=0.0, source_size=0):
+    names = sorted(icon_map)
+    encoded_names = [name.encode() for name in names]
+    values = [zlib.compress(icon_map[name].encode()) for name in names]
+
+    names_start = HEADER.size + ENTRY.size * len(names)
+    data_start = names_start + sum(len(name) for name in encoded_names)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(names), source_mtime, source_size))
+        name_offset, data_offset = names_start, data_start
+        for name, value in zip(encoded_names, values):
+            f.write(ENTRY.pack(name_offset, len(name), data_offset, len(value)))
+            name_offset += len(name)
+            data_offset += len(value)
+        for name in encoded_names:
+            f.write(name)
+        for value in values:
+            f.write(value)
+    os.replace(tmp_path, path)
+
+
+def read_json_map(path, compressed=None):
+    """Reads a json icon set, `compressed` None detects zlib compressed files"""
+    with open(path, mode="rb") as f:
+        data = f.read()
+    if compressed is None:
+        compressed = data[:1] == b"\x78"
+    if compressed:
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+def is_packable(icon_map) -> bool:
+    return isinstance(icon_map, dict) and all(isinstance(k, str) and isinstance(v, str)
+                                              for k, v in icon_map.items())
+
+
+def convert(json_path, pack_path=None, compressed=None) -> str:
+    """Writes the pack of a json icon set, next to it unless `pack_path` is given"""
+    icon_map = read_json_map(json_path, compressed)
+    if not is_packable(icon_map):
+        raise ValueError(f"{json_path} doesn't map icon names to strings")
+    pack_path = pack_path or os.path.splitext(json_path)[0] + ".pack"
+    stat = os.stat(json_path)
+    write_pack(icon_map, pack_path, stat.st_mtime, stat.st_size)
+    return pack_path
+
+
+def _open_valid(pack_path, json_path, check_mtime=True):
+    if not os.path.isfile(pack_path):
+        return None
+    try:
+        pack = IconPack(pack_path)
+    except (OSError, ValueError):
+        return None
+    if pack.matches(json_path, check_mtime):
+        return pack
+    pack.close()
+    return None
+
+
+def load_icon_map(json_path, compressed=False, cache_dir=None):
+    """
+    Opens an icon set as a pack, from next to the json file or from `cache_dir`, building the
+    cached one if neither is up-to-date. Sets that can't be packed are returned as parsed json.
+    """
+    # checkouts and installs don't keep mtimes, so bundled packs are only checked by size
+    pack = _open_valid(os.path.splitext(json_path)[0] + ".pack", json_path, check_mtime=False)
+    if pack:
+        return pack
+
+    cached_path = None
+    if cache_dir:
+        path_hash = hashlib.blake2b(os.path.abspath(json_path).encode(), digest_size=4).hexdigest()
+        stem = os.path.splitext(os.path.basename(json_path))[0]
+        cached_path = os.path.join(cache_dir, f"{stem}-{path_hash}.pack")
+        pack = _open_valid(cached_path, json_path)
+        if pack:
+            return pack
+
+    icon_map = read_json_map(json_path, compressed)
+    if cached_path and is_packable(icon_map):
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            stat = os.stat(json_path)
+            write_pack(icon_map, cached_path, stat.st_mtime, stat.st_size)
+            return IconPack(cached_path)
+        except (OSError, ValueError) as err:
+            print(f"Error occurred while packing {json_path}: {err}")
+    if isinstance(icon_map, dict):
+        return dict(sorted(icon_map.items()))
+    return icon_map
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:]:
+        try:
+            print(f"{arg} -> {convert(arg)}")
+        except ValueError as err:
+            print(f"Skipped {err}")
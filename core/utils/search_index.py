@@ -0,0 +1,160 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Callable, Iterable, Optional
+
+# characters icon names use to separate words, %20 is how sanitize_query encodes spaces
+TOKEN_SEPARATORS = re.compile(r"(?:%20|[\s\-_.,()/+])+")
+NGRAM_SIZE = 3
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits a name or a query into lower case words"""
+    return [token for token in TOKEN_SEPARATORS.split(text.lower()) if token]
+
+
+def normalize_query(query: str) -> str:
+    return query.lower().replace("%20", " ").strip()
+
+
+def ngrams(token: str, size=NGRAM_SIZE) -> set[str]:
+    return {token[i:i + size] for i in range(len(token) - size + 1)}
+
+
+def prefix_range(sorted_values: list[str], prefix: str) -> tuple[int, int]:
+    """Returns the slice of `sorted_values` starting with `prefix`"""
+    start = bisect_left(sorted_values, prefix)
+    end = bisect_right(sorted_values, prefix + "￿", lo=start)
+    return start, end
+
+
+class SearchIndex:
+    """
+    Search index over the names of an icon set.
+
+    Names are kept sorted so a query that is the start of a name is found with a binary search.
+    Every name is also split into words, and words are indexed by their n-grams, so a query
+    matches a name when each of its words is the start of, or is contained in, one of the name's
+    words, e.g. "arrow left" matches "arrow-left-circle" and "left (outline)" alike.
+    Results are returned as positions in `keys`, names starting with the query first.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys: list[str] = sorted(keys, key=str.lower)
+        self.lower_keys = [key.lower() for key in self.keys]
+
+        self.key_tokens = [set(tokenize(key)) for key in self.lower_keys]
+        postings: dict[str, list[int]] = {}
+        for index, tokens in enumerate(self.key_tokens):
+            for token in tokens:
+                postings.setdefault(token, []).append(index)
+        self.tokens = sorted(postings)
+        self.postings = [postings[token] for token in self.tokens]
+
+        self.grams: dict[str, list[int]] = {}
+        for token_id, token in enumerate(self.tokens):
+            for gram in ngrams(token):
+                self.grams.setdefault(gram, []).append(token_id)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _tokens_matching(self, word: str) -> set[int]:
+        start, end = prefix_range(self.tokens, word)
+        token_ids = set(range(start, end))
+        if len(word) >= NGRAM_SIZE:
+            # words found inside other words, only tokens having all the n-grams of the word are checked
+            candidates = None
+            for gram in ngrams(word):
+                ids = self.grams.get(gram)
+                if not ids:
+                    candidates = set()
+                    break
+                candidates = set(ids) if candidates is None else candidates.intersection(ids)
+            token_ids.update(token_id for token_id in candidates if word in self.tokens[token_id])
+        return token_ids
+
+    def search(self, query: str) -> list[int]:
+        """Returns the positions in `keys` of every name matching `query`"""
+        query = normalize_query(query)
+        if not query:
+            return list(range(len(self.keys)))
+
+        start, end = prefix_range(self.lower_keys, query)
+        matches = None
+        for word in sorted(tokenize(query), key=len, reverse=True):
+            ids = set()
+            for token_id in self._tokens_matching(word):
+                ids.update(self.postings[token_id])
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                break
+
+        result = list(range(start, end))
+        if matches:
+            result += sorted(index for index in matches if not start <= index < end)
+        return result
+
+    def search_keys(self, query: str) -> list[str]:
+        return [self.keys[index] for index in self.search(query)]
+
+    def _key_matches(self, index, words) -> bool:
+        tokens = self.key_tokens[index]
+        return all(any(token.startswith(word) or (len(word) >= NGRAM_SIZE and word in token) for token in tokens)
+                   for word in words)
+
+    @staticmethod
+    def can_narrow(old_query: str, new_query: str) -> bool:
+        """Tests if every name matching `new_query` is also among the results of `old_query`"""
+        old_query, new_query = normalize_query(old_query), normalize_query(new_query)
+        if not old_query or not new_query.startswith(old_query):
+            return False
+        old_words, new_words = tokenize(old_query), tokenize(new_query)
+        if not old_words:
+            # only names starting with the query were matched
+            return False
+        # a word growing to NGRAM_SIZE letters starts matching inside words too, which the old results left out
+        last = len(old_words) - 1
+        return not len(old_words[last]) < NGRAM_SIZE <= len(new_words[last])
+
+    def narrow(self, indexes: list[int], query: str) -> list[int]:
+        """Same as search, only checking `indexes`, the results of a query `query` extends"""
+        query = normalize_query(query)
+        start, end = prefix_range(self.lower_keys, query)
+        words = tokenize(query)
+        result = list(range(start, end))
+        if words:
+            result += sorted(index for index in indexes
+                             if not start <= index < end and self._key_matches(index, words))
+        return result
+
+
+class IncrementalSearch:
+    """
+    Remembers the last query and its results, so that a query extending it (one more letter
+    typed) only rechecks the previous results instead of searching everything again.
+
+    `search(query)` does a full search, `narrow(results, query)` filters previous results and
+    `can_narrow(old_query, new_query)` tells when that gives the same results, by default when
+    the new query starts with the old one. `scope` is anything else the results depend on
+    (a category, the searched map...), a different scope always searches everything.
+    """
+
+    def __init__(self, search: Callable, narrow: Callable, can_narrow: Optional[Callable] = None):
+        self.full_search = search
+        self.narrow = narrow
+        self.can_narrow = can_narrow or (lambda old_query, new_query: bool(old_query)
+                                         and new_query.startswith(old_query))
+        self.query = None
+        self.scope = None
+        self.results = None
+
+    def search(self, query, scope=None) -> list:
+        if self.results is not None and scope == self.scope and self.can_narrow(self.query, query):
+            results = self.narrow(self.results, query)
+        else:
+            results = self.full_search(query)
+        self.query, self.scope, self.results = query, scope, results
+        return results
+
+    def reset(self):
+        self.query = self.scope = self.results = None
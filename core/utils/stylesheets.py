@@ -0,0 +1,141 @@
+"""
+Applying the stylesheets of an imported svg to its elements.
+
+Stylesheet rules used to be turned into an xpath each and searched for over the whole document,
+one search per rule. Rules that are a single tag, id and classes, which is what icon sets are
+made of, are now indexed by the id, class or tag they need, and the document is walked once,
+each element only checked against the rules it could match. Other rules still go through xpath,
+compiled once and kept across imports.
+"""
+import re
+from functools import lru_cache
+
+from inkex import Style
+from inkex.utils import NSS
+from lxml import etree
+
+SVG_PREFIX = "{%s}" % NSS["svg"]
+# tag, #id and .classes of a rule without combinators or attributes
+SIMPLE_RULE = re.compile(r"(?P<tag>\*|\w+)?(?:#(?P<id>[-\w]+))?(?P<classes>(?:\.[-\w]+)*)")
+
+
+@lru_cache(maxsize=1024)
+def compiled_xpath(xpath):
+    """Compiled selectors are kept across imports, icon sets repeat the same stylesheet rules in every file"""
+    return etree.XPath(xpath, namespaces=NSS)
+
+
+@lru_cache(maxsize=4096)
+def parse_rule(rule):
+    """Returns (tag, id, classes) of a simple rule, None for rules that need an xpath"""
+    match = SIMPLE_RULE.fullmatch(rule)
+    if not match:
+        return None
+    # no tag matches any element, like *
+    tag = match.group("tag") if match.group("tag") != "*" else None
+    classes = frozenset(match.group("classes").split(".")[1:])
+    return tag, match.group("id"), classes
+
+
+class StyleIndex:
+    """The styles of a document's stylesheets, by the id, class or tag an element needs to match them"""
+
+    def __init__(self, svg):
+        # (style, scrubs ids, scrubs classes) in stylesheet order
+        self.styles = []
+        self.by_id = {}
+        self.by_class = {}
+        self.by_tag = {}
+        self.universal = []
+        # elements matched by the rules that aren't simple -> orders of their styles
+        self.matched = {}
+
+        for sheet in svg.getroot().stylesheets:
+            for style in sheet:
+                order = len(self.styles)
+                scrubs_id = scrubs_class = False
+                for rule in style.rules:
+                    if not rule.rule:
+                        continue
+                    parsed = parse_rule(rule.rule)
+                    if parsed is None:
+                        xpath = rule.to_xpath()
+                        scrubs_id |= "@id" in xpath
+                        scrubs_class |= "@class" in xpath
+                        self.match_xpath(svg, order, xpath)
+                    else:
+                        scrubs_id |= parsed[1] is not None
+                        scrubs_class |= bool(parsed[2])
+                        self.add_rule(order, parsed)
+                self.styles.append((style, scrubs_id, scrubs_class))
+
+    def match_xpath(self, svg, order, xpath):
+        # matched up front, against the document as it was imported
+        result = compiled_xpath(xpath)(svg)
+        if isinstance(result, list):
+            for elem in result:
+                self.matched.setdefault(elem, set()).add(order)
+
+    def add_rule(self, order, parsed):
+        tag, elem_id, classes = parsed
+        entry = (order, parsed)
+        if elem_id:
+            self.by_id.setdefault(elem_id, []).append(entry)
+        elif classes:
+            self.by_class.setdefault(min(classes), []).append(entry)
+        elif tag:
+            self.by_tag.setdefault(tag, []).append(entry)
+        else:
+            self.universal.append(entry)
+
+    def lookup(self, elem):
+        """
+        Returns the styles matching `elem` in stylesheet order. Styles with id or class rules scrub
+        them from the element as they're matched, so they don't match the rules of later styles.
+        """
+        # read through attrib, inkex's get() looks up its wrapped attributes first
+        attrib = elem.attrib
+        elem_id = attrib.get("id")
+        classes = set(attrib.get("class", "").split())
+        tag = elem.tag[len(SVG_PREFIX):] if elem.tag.startswith(SVG_PREFIX) else None
+
+        # rules the element might match, by the order of their style
+        rules = {order: None for order in self.matched.get(elem, ())}
+        candidates = [self.by_id.get(elem_id, ()), self.by_tag.get(tag, ()), self.universal]
+        candidates += [self.by_class.get(name, ()) for name in classes]
+        for entries in candidates:
+            for order, rule in entries:
+                if rules.get(order, ()) is not None:
+                    rules.setdefault(order, []).append(rule)
+
+        styles = []
+        for order in sorted(rules):
+            # None for the styles already matched with an xpath
+            if rules[order] is not None and not any(
+                    (rule_tag is None or rule_tag == tag) and (rule_id is None or rule_id == elem_id)
+                    and rule_classes <= classes for rule_tag, rule_id, rule_classes in rules[order]):
+                continue
+            style, scrubs_id, scrubs_class = self.styles[order]
+            styles.append(style)
+            if scrubs_id:
+                elem.set_random_id()
+                elem_id = attrib.get("id")
+            if scrubs_class:
+                elem.set("class", None)
+                classes = set()
+        return styles
+
+
+def merge_stylesheets(svg):
+    """Applies the stylesheets of `svg` to the style attribute of its elements, in a single walk of the document"""
+    index = StyleIndex(svg)
+    if not index.styles:
+        return
+    for elem in svg.getroot().iter(etree.Element):
+        styles = index.lookup(elem)
+        if not styles:
+            continue
+        output = Style()
+        for style in styles:
+            output += style
+        elem.style = output + elem.style
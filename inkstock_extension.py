@@ -1,15 +1,20 @@
 import os
 from base64 import encodebytes
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import inkex
-from inkex import EffectExtension, Image, Style
+from inkex import EffectExtension, Image
 from inkex.elements import (
     load_svg, Defs, NamedView, Metadata,
     SvgDocumentElement, StyleElement
 )
+
+from core.utils import stylesheets
 from inkstock import InkStockApp
 
+# files parsed at the same time by a batch import, lxml lets go of the GIL while parsing
+IMPORT_WORKERS = min(8, os.cpu_count() or 1)
+
 
 class InkstockExtension(EffectExtension):
 
@@ -23,24 +28,7 @@ class InkstockExtension(EffectExtension):
 
     def merge_stylesheets(self, svg):
         """Because we don't want conflicting style-sheets (classes, ids, etc) we scrub them"""
-        elems = defaultdict(list)
-        # 1. Find all styles, and all elements that apply to them
-        for sheet in svg.getroot().stylesheets:
-            for style in sheet:
-                xpath = style.to_xpath()
-                for elem in svg.xpath(xpath):
-                    elems[elem].append(style)
-                    # 1b. Clear possibly conflicting attributes
-                    if '@id' in xpath:
-                        elem.set_random_id()
-                    if '@class' in xpath:
-                        elem.set('class', None)
-        # 2. Apply each style cascade sequentially
-        for elem, styles in elems.items():
-            output = Style()
-            for style in styles:
-                output += style
-            elem.style = output + elem.style
+        stylesheets.merge_stylesheets(svg)
 
     def import_raster(self, filename, handle):
         """Import a raster image"""
@@ -60,6 +48,10 @@ class InkstockExtension(EffectExtension):
     def import_svg(self, new_svg):
         """Import an svg file into the current document"""
         self.merge_stylesheets(new_svg)
+        yield from self.import_svg_children(new_svg)
+
+    def import_svg_children(self, new_svg):
+        """Yields the objects of an svg whose stylesheets are already merged, its defs go to self.svg.defs"""
         for child in new_svg.getroot():
             if isinstance(child, SvgDocumentElement):
                 yield from self.import_svg(child)
@@ -73,36 +65,69 @@ class InkstockExtension(EffectExtension):
                 yield child
 
     def import_from_file(self, filename):
+        loaded = self.load_file(filename)
+        if loaded is not None:
+            self.add_to_layer([self.make_container(filename, loaded)])
+
+    def import_files(self, filenames):
+        """
+        Imports many files at once. Files are read, parsed and have their stylesheets merged in a pool
+        of threads, then everything is added to the current layer in one go.
+        """
+        with ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="InkstockImport") as pool:
+            loaded = list(pool.map(self.load_file_safely, filenames))
+        # defs and layer are changed here, in a single thread, in the order the files were given
+        self.add_to_layer([self.make_container(filename, item)
+                           for filename, item in zip(filenames, loaded) if item is not None])
+
+    def load_file_safely(self, filename):
+        try:
+            return self.load_file(filename)
+        except Exception as err:
+            print(f"Error occurred while importing {filename}: {err}")
+            return None
+
+    def load_file(self, filename):
+        """Returns the svg of a file with its stylesheets merged, an image element for rasters, None for neither"""
         if not filename or not os.path.isfile(filename):
-            return
+            return None
         with open(filename, 'rb') as fhl:
             head = fhl.read(100)
             if b'<?xml' in head or b'<svg' in head:
                 new_svg = load_svg(head + fhl.read())
-                # Add each object to the container
-                objs = list(self.import_svg(new_svg))
-
-                if len(objs) == 1 and isinstance(objs[0], inkex.Group):
-                    # Prevent too many groups, if item aready has one.
-                    container = objs[0]
-                else:
-                    # Make a new group to contain everything
-                    container = inkex.Group()
-                    for child in objs:
-                        container.append(child)
-
-                # Retain the original filename as a group label
-                container.label = os.path.basename(filename)
-                # Apply unit transformation to keep things the same sizes.
-                container.transform.add_scale(self.svg.unittouu(1.0)
-                                              / new_svg.getroot().unittouu(1.0))
-
-            else:
-                container = self.import_raster(filename, fhl)
-
-            self.svg.get_current_layer().append(container)
-
-            # Make sure that none of the new content is a layer.
+                self.merge_stylesheets(new_svg)
+                return new_svg
+            return self.import_raster(filename, fhl)
+
+    def make_container(self, filename, loaded):
+        """Groups the objects of a loaded svg under the file's name, rasters are already an image element"""
+        if isinstance(loaded, Image):
+            return loaded
+        new_svg = loaded
+        # Add each object to the container
+        objs = list(self.import_svg_children(new_svg))
+
+        if len(objs) == 1 and isinstance(objs[0], inkex.Group):
+            # Prevent too many groups, if item aready has one.
+            container = objs[0]
+        else:
+            # Make a new group to contain everything
+            container = inkex.Group()
+            container.extend(objs)
+
+        # Retain the original filename as a group label
+        container.label = os.path.basename(filename)
+        # Apply unit transformation to keep things the same sizes.
+        container.transform.add_scale(self.svg.unittouu(1.0)
+                                      / new_svg.getroot().unittouu(1.0))
+        return container
+
+    def add_to_layer(self, containers):
+        containers = [container for container in containers if container is not None]
+        self.svg.get_current_layer().extend(containers)
+
+        # Make sure that none of the new content is a layer.
+        for container in containers:
             for child in container.descendants():
                 if isinstance(child, inkex.Group):
                     child.set("inkscape:groupmode", None)
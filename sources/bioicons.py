@@ -2,12 +2,9 @@ import os
 from datetime import datetime
 from os.path import exists
 
-import requests
-from cachecontrol import CacheControlAdapter
-from cachecontrol.caches import FileCache
-from cachecontrol.heuristics import ExpiresAfter
 
 from core.utils import asyncme
+from core.utils.search_index import IncrementalSearch
 from sources.source import RemoteSource, sanitize_query, SourceType
 from sources.source_page import RemotePage, NoResultsPage
 from sources.source_file import RemoteFile
@@ -93,6 +90,7 @@ class BioIconsSource(RemoteSource):
     is_enabled = True
     options_window_width = 300
     items_per_page = 16
+    search_as_you_type = True
     window_cls = BioWindow
 
     db_url = "https://bioicons.com/icons/icons.json"
@@ -107,16 +105,19 @@ class BioIconsSource(RemoteSource):
         self.icon_map = None
         self.category = ""
         self._json = None
-        self.session.mount(
-            "https://",
-            CacheControlAdapter(
-                cache=FileCache(cache_dir),
-                heuristic=ExpiresAfter(days=5),
-            ),
-        )
         self.options = {}
         self.options_window = OptionsWindow(self)
-        self.options_window.set_option("query", None, OptionType.SEARCH, f"Search {self.name}")
+        search_field = self.options_window.set_option("query", None, OptionType.SEARCH, f"Search {self.name}")
+        if self.search_as_you_type:
+            search_field.search_as_you_type()
+        self.incremental_search = IncrementalSearch(self.find_icons, self.narrow_icons)
+
+    def find_icons(self, query):
+        return [icon for icon in self.icon_map if query in icon["name"] and self.category in icon["category"]]
+
+    @staticmethod
+    def narrow_icons(results, query):
+        return [icon for icon in results if query in icon["name"]]
 
     def get_page(self, page_no: int):
         results = self.results[page_no * self.items_per_page: self.items_per_page * (page_no + 1)]
@@ -131,7 +132,7 @@ class BioIconsSource(RemoteSource):
         self.window.show_spinner()
         # check if local db is up-to-date with Last Modified header
         try:
-            response = requests.head(self.db_url)
+            response = self.session.head(self.db_url)
         except Exception:
             response = None
 
@@ -163,17 +164,13 @@ class BioIconsSource(RemoteSource):
         self.options_window.set_option("category_grp", [select_option], OptionType.GROUP, "Select Category")
         self.options_window.set_option("info", "", OptionType.TEXTVIEW, show_separator=False)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         self.results = []
         self.query = sanitize_query(query)
         self.window.clear_pages()
         self.window.show_spinner()
-        if query:
-            self.results = [icon for icon in self.icon_map
-                            if query in icon["name"] and self.category in icon["category"]]
-        else:
-            self.results = [icon for icon in self.icon_map if self.category in icon["category"]]
+        self.results = self.incremental_search.search(query, scope=(self.category, id(self.icon_map)))
 
         if not self.results:
             self.window.add_page(NoResultsPage(query))
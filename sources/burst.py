@@ -63,6 +63,7 @@ class Burst(RemoteSource, OptionsChangeListener):
     is_default = False
     is_enabled = True
     items_per_page = 12
+    prefetch_depth = 1
     options_window_width = 300
     window_cls = BurstWindow
     source_type = SourceType.PHOTO
@@ -137,7 +138,7 @@ class Burst(RemoteSource, OptionsChangeListener):
             self.results.extend(results)
         self.get_page(0)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         self.req_url = "https://burst.shopify.com/photos/search"
         self.query = query
@@ -54,7 +54,7 @@ class ColorMindPalette(RemoteFile):
         self.id = str(hash(self.info["id"] + self.name))  # overrode implementation because info["file"] is empty
         self.file_name = self.name + ".svg"
 
-    def get_thumbnail(self):
+    def generate_palette(self):
         if not self.info["thumbnail"]:
             if not self.preferred_swatch_colors:
                 svg = gen_random_svg_palette()
@@ -63,6 +63,12 @@ class ColorMindPalette(RemoteFile):
             self.info["thumbnail"] = svg
             self.info["file"] = svg
 
+    def get_thumbnail_data(self):
+        self.generate_palette()
+        return self.info["thumbnail"].encode()
+
+    def get_thumbnail(self):
+        self.generate_palette()
         file_path = os.path.join(self.source.cache_dir, self.file_name)
         with open(file_path, mode="w+") as f:
             f.writelines(self.info["thumbnail"])
@@ -168,19 +174,24 @@ class ColorMindPalettesSource(RemoteSource):
 
         svg_data: str = single_item.data.info["thumbnail"]
 
+        @asyncme.mainloop_post
+        def show_swatch_results(fill_colors):
+            self.preferred_swatch_colors = list(map(lambda color: hex_to_rgb(color), fill_colors.keys()))
+            self.window.clear_pages()
+            self.window.show_spinner()
+            self.get_page(0)
+
         def cb(result, error):
             if error:
                 print(f"Error occurred in task(Color Extraction): {error}")
             if result:
                 svg, fill_colors, stroke_colors = result
-                self.preferred_swatch_colors = list(map(lambda color: hex_to_rgb(color), fill_colors.keys()))
-                self.window.clear_pages()
-                self.window.show_spinner()
-                self.get_page(0)
+                # runs in the shared loop, which mustn't wait for the main loop
+                show_swatch_results(fill_colors)
 
         self.add_task_to_queue(self.color_ext.extract_color, cb, svg_data)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         pass
 
@@ -56,7 +56,7 @@ class FAPage(RemotePage):
         self.default_color_task = None
 
     def get_page_content(self):
-        for key, value in self.results:
+        for key in self.results:
             name = "-".join(key.split("-")[:-1])
             category = key.split("-")[-1]
             url = f"https://raw.githubusercontent.com/FortAwesome/Font-Awesome/6.x/svgs/{category}/{name}.svg"
@@ -92,6 +92,7 @@ class FASource(SvgSource):
     is_optimized = False
     options_window_width = 350
     items_per_page = 16
+    search_as_you_type = True
     window_cls = FAWindow
 
     json_path = 'json/font-awesome.json'
@@ -110,8 +111,7 @@ class FASource(SvgSource):
         self.query = sanitize_query(query)
         self.window.clear_pages()
         self.window.show_spinner()
-        self.results = [(key, value) for key, value in self.icon_map.items()
-                        if key.startswith(query)]
+        self.results = self.find_icons(query)
         if not self.results:
             self.window.add_page(NoResultsPage(query))
         else:
@@ -4,9 +4,11 @@ import os
 from os.path import exists
 
 from core.utils import asyncme
+from core.utils.search_index import IncrementalSearch
 from sources.source import RemoteSource, SourceType
 from sources.source_page import RemotePage, NoResultsPage
 from sources.source_file import FontFile
+from core.cache_manager import cache_manager
 from core.constants import CACHE_DIR
 from core.gui.pixmap_manager import PixmapManager, SIZE_ASPECT_CROP
 from core.utils.text_to_png import render_text_to_png
@@ -47,11 +49,11 @@ class GoogleFontFile(FontFile):
     def get_thumbnail(self):
         file_name = self.name + ".png"
         font_data = self.source.to_local_file(self.info["thumbnail"], file_name, content=True)
-        file_path = os.path.join(self.source.cache_dir, file_name)
+        file_path = os.path.join(cache_manager.category_dir("fonts"), file_name)
         render_text_to_png(font_file=io.BytesIO(font_data), save_path=file_path, text=self.text,
                            spacing=self.line_spacing, font_size=self.font_size, text_color=self.color,
                            bg_color=self.bg_color)
-        return file_name
+        return file_path
 
 
 class GoogleFontsPage(RemotePage):
@@ -81,8 +83,9 @@ class GoogleFontsSource(RemoteSource, OptionsChangeListener):
     file_cls = GoogleFontFile
     page_cls = GoogleFontsPage
     is_default = False
-    is_enabled = True
+    is_enabled = exists("json/google_fonts.json")
     items_per_page = 4
+    search_as_you_type = True
     window_cls = GoogleFontsWindow
 
     def __init__(self, cache_dir, import_manager):
@@ -91,14 +94,25 @@ class GoogleFontsSource(RemoteSource, OptionsChangeListener):
         self.query = ""
         self.options = {}
         self.options_window = OptionsWindow(self)
-        self.options_window.set_option("query", None, OptionType.SEARCH, "Search Google Fonts")
+        search_field = self.options_window.set_option("query", None, OptionType.SEARCH, "Search Google Fonts")
+        if self.search_as_you_type:
+            search_field.search_as_you_type()
 
+        self.fonts = {}
+        self.incremental_search = IncrementalSearch(self.find_fonts, self.narrow_fonts)
+
+    def load_fonts(self):
         # ------init font file --------#
-        if exists("json/google_fonts.json"):
+        if not self.fonts and exists("json/google_fonts.json"):
             with open("json/google_fonts.json", mode="r") as f:
                 self.fonts = json.load(f)
-        else:
-            self.is_enabled = False
+
+    def find_fonts(self, query):
+        return [(key, value) for key, value in self.fonts.items() if query in key.lower()]
+
+    @staticmethod
+    def narrow_fonts(results, query):
+        return [(key, value) for key, value in results if query in key.lower()]
 
     def get_page(self, page_no: int):
         self.current_page = page_no
@@ -113,8 +127,7 @@ class GoogleFontsSource(RemoteSource, OptionsChangeListener):
         self.query = query
         self.window.clear_pages()
         self.window.show_spinner()
-        self.results = [(key, value) for key, value in self.fonts.items()
-                        if query in key.lower()]
+        self.results = self.incremental_search.search(query)
         if not self.results:
             self.window.add_page(NoResultsPage(query))
         else:
@@ -122,6 +135,7 @@ class GoogleFontsSource(RemoteSource, OptionsChangeListener):
 
     def on_window_attached(self, window: BasicWindow, window_pane):
         super().on_window_attached(window, window_pane)
+        self.load_fonts()
         self.query = "a"
         asyncme.run_or_none(self.search)("a")
 
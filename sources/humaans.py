@@ -63,6 +63,9 @@ class HumaansFile(RemoteFile):
         self.humaans_svg.save_to_file(file_path)
         return self.file_name
 
+    def get_thumbnail_data(self):
+        return self.humaans_svg.to_bytes()
+
     def get_file(self):
         return "file://" + os.path.join(self.source.cache_dir, self.get_thumbnail())
 
@@ -217,18 +220,19 @@ class HumaansSource(RemoteSource, OptionsChangeListener, ViewChangeListener):
     def update_items_sequentially(self, single_items, single_item, multi_items):
         if single_item:
             self.window.results.singleview.multi_items_to_update.update(multi_items)
-            thumbnail = single_item.data.get_thumbnail()
+            # rendered from the svg in memory, the edited humaans isn't written out
+            thumbnail = single_item.data.get_thumbnail_data()
             pixbuf = self.pix_manager.get_pixbuf(thumbnail, self.pix_manager.pref_width, self.pix_manager.pref_height,
                                                  self.pix_manager.padding, self.pix_manager.single_preview_scale,
                                                  SIZE_ASPECT_GROW, return_pixbuf=True)
             self.window.results.singleview.set_image(pixbuf)
-            pixbuf_path = self.pix_manager.get_pixbuf(thumbnail, self.pix_manager.preview_item_width,
-                                                      self.pix_manager.preview_item_height,
-                                                      self.pix_manager.preview_padding,
-                                                      self.pix_manager.preview_scaling,
-                                                      self.pix_manager.preview_aspect_ratio,
-                                                      thumbnail=True)
-            self.update_item(pixbuf_path, single_items[0])
+            thumb = self.pix_manager.get_pixbuf(thumbnail, self.pix_manager.preview_item_width,
+                                                self.pix_manager.preview_item_height,
+                                                self.pix_manager.preview_padding,
+                                                self.pix_manager.preview_scaling,
+                                                self.pix_manager.preview_aspect_ratio,
+                                                return_pixbuf=True)
+            self.update_item(self.pix_manager.keep_render(thumbnail, "thumb", thumb), single_items[0])
         else:
             for item in multi_items:
                 self.pix_manager.get_pixbuf_for_type(item.data, "multi", self.update_item, item)
@@ -109,7 +109,7 @@ class JoeschmoeSource(SvgSource):
         self.window.show_spinner()
         self.get_page(0, req_url)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         self.results = []
         self.query = sanitize_query(query)
@@ -39,6 +39,9 @@ class JsonSvgIcon(RemoteFile):
             f.flush()
         return os.path.join(CACHE_DIR, self.file_name)
 
+    def get_thumbnail_data(self):
+        return self.info["thumbnail"].encode()
+
     def get_file(self):
         svg = self.info["file"]
         with open(os.path.join(CACHE_DIR, self.file_name), mode="w+") as f:
@@ -55,7 +58,8 @@ class JsonSvgIconsPage(RemotePage):
         self.default_color_task = None
 
     def get_page_content(self):
-        for name, svg in self.results:
+        for name, key in self.results:
+            svg = self.remote_source.icon_map[key]
 
             info = {
                 "id": name,
@@ -81,6 +85,7 @@ class JsonSvgIconsSource(SvgSource, ABC):
     is_optimized = False
     options_window_width = 300
     items_per_page = 16
+    search_as_you_type = True
     window_cls = JsonSvgWindow
     default_search_query = ""
     should_load_icon_map = False
@@ -88,6 +93,7 @@ class JsonSvgIconsSource(SvgSource, ABC):
     def __init__(self, cache_dir, import_manager):
         super().__init__(cache_dir, import_manager)
         self.icon_map = None
+        self.icon_names = {}
         self.pix_manager = self.get_pixmanger()
 
     def load_icon_map(self):
@@ -96,6 +102,9 @@ class JsonSvgIconsSource(SvgSource, ABC):
             json_exists = exists(self.json_path)
             if json_exists:
                 self.icon_map = self.read_map_file(self.json_path)
+                # display names without the extension or the "(style)" suffix
+                self.icon_names = {key: key.split("(")[0] if "(" in key else key.split(".")[0]
+                                   for key in self.icon_map}
         # ---------
 
     def get_page(self, page_no: int):
@@ -106,19 +115,14 @@ class JsonSvgIconsSource(SvgSource, ABC):
             page.default_color_task = self.default_color_task
             self.window.add_page(page)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         self.results = []
         self.query = sanitize_query(query)
         self.window.clear_pages()
         self.window.show_spinner()
-        if query == "":
-            self.results = [(key.split("(")[0] if "(" in key else key.split(".")[0], value)
-                            for key, value in self.icon_map.items()]
-        else:
-            self.results = [(key.split("(")[0] if "(" in key else key.split(".")[0], value)
-                            for key, value in self.icon_map.items()
-                            if key.startswith(query)]
+        # svgs are only read from the icon map once their page is shown
+        self.results = [(self.icon_names[key], key) for key in self.find_icons(query)]
         if not self.results:
             self.window.add_page(NoResultsPage(query))
         else:
@@ -55,7 +55,8 @@ class MaterialIconsPage(RemotePage):
         self.default_color_task = None
 
     def get_page_content(self):
-        for url in self.results:
+        for key in self.results:
+            url = self.remote_source.icon_map[key]
 
             if url.split('/')[9].replace('materialicons', '') == '':
                 icon_type = ''
@@ -103,6 +104,7 @@ class MaterialIconsSource(SvgSource):
     is_optimized = False
     options_window_width = 350
     items_per_page = 16
+    search_as_you_type = True
     window_cls = MaterialWindow
 
     json_path = 'json/material-icons.json'
@@ -115,14 +117,13 @@ class MaterialIconsSource(SvgSource):
             page.default_color_task = self.default_color_task
             self.window.add_page(page)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         self.results = []
         self.query = sanitize_query(query)
         self.window.clear_pages()
         self.window.show_spinner()
-        self.results = [value for key, value in self.icon_map.items()
-                        if key.startswith(query)]
+        self.results = self.find_icons(query)
         if not self.results:
             self.window.add_page(NoResultsPage(query))
         else:
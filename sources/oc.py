@@ -83,6 +83,7 @@ class OpenClipArt(RemoteSource, OptionsChangeListener):
     is_default = False
     is_enabled = True if BeautifulSoup else False
     items_per_page = 12
+    prefetch_depth = 1
     options_window_width = 300
     window_cls = OpenClipArtWindow
     source_type = SourceType.ILLUSTRATION
@@ -90,6 +91,8 @@ class OpenClipArt(RemoteSource, OptionsChangeListener):
     def __init__(self, cache_dir, import_manager) -> None:
         super().__init__(cache_dir, import_manager)
         self.page_offset = 0
+        # pages of search results fetched from open clipart, they don't line up with the pages shown
+        self.fetched_pages = 0
         self.options = {}
         self.results = []
         self.query = ""
@@ -98,23 +101,25 @@ class OpenClipArt(RemoteSource, OptionsChangeListener):
         self.options_window.set_option("query", None, OptionType.SEARCH, f"Search {self.name}")
 
     def get_page(self, page_no: int):
-        displayed_results = self.items_per_page * (self.current_page + 1)
+        # pages are asked for by index, the results window prefetches pages past the current one
+        displayed_results = self.items_per_page * (page_no + 1)
         page_results = []
         while len(self.results) < displayed_results:
-            param = {"p": self.current_page + 1 + self.page_offset} if self.query == "" \
-                else {"p": self.current_page + 1 + self.page_offset, "query": self.query}
+            param = {"p": self.fetched_pages + 1 + self.page_offset} if self.query == "" \
+                else {"p": self.fetched_pages + 1 + self.page_offset, "query": self.query}
             results = self.extract_results(self.req_url, param)
+            self.fetched_pages += 1
             self.results.extend(results)
             if not results:
                 break
         else:
             self.current_page = page_no
             page_results = self.results[
-                           self.current_page * self.items_per_page:
-                           (self.current_page * self.items_per_page) + self.items_per_page
+                           page_no * self.items_per_page:
+                           (page_no * self.items_per_page) + self.items_per_page
                            ]
         if page_results:
-            page = OpenClipArtPage(self, self.current_page, page_results)
+            page = OpenClipArtPage(self, page_no, page_results)
             self.window.add_page(page)
         elif page_no == 0 and self.query:
             self.window.add_page(NoResultsPage(self.query.replace("%20", "+")))
@@ -124,13 +129,14 @@ class OpenClipArt(RemoteSource, OptionsChangeListener):
         self.query = ""
         self.search(self.query)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         self.query = query
         self.window.clear_pages()
         self.window.show_spinner()
         self.results = []
         self.current_page = 0
+        self.fetched_pages = 0
         self.get_page(0)
 
     def extract_results(self, url, params=None):
@@ -163,7 +169,7 @@ class OpenClipArt(RemoteSource, OptionsChangeListener):
                 break
             else:
                 self.page_offset += 1
-                params["p"] = self.current_page + 1 + self.page_offset
+                params["p"] = self.fetched_pages + 1 + self.page_offset
         return results
 
     def on_window_attached(self, window: BasicWindow, window_pane):
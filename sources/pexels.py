@@ -1,3 +1,4 @@
+from core.network import async_session
 from core.utils import asyncme
 from keys import KEYS
 from sources.source import RemoteSource, sanitize_query, SourceType
@@ -34,20 +35,22 @@ class PexelsFile(RemoteFile):
     def get_thumbnail(self):
         return self.source.to_local_file(self.info["thumbnail"], self.file_name, self.headers)
 
+    async def get_thumbnail_async(self):
+        return await self.source.to_local_file_async(self.info["thumbnail"], self.file_name, self.headers)
+
 
 class PexelsPage(RemotePage):
     def __init__(self, remote_source, page_no: int, query):
         super().__init__(remote_source, page_no)
         self.query = query
-
-    def get_page_content(self):
-        headers_list = {
+        self.headers = {
             "Accept": "*/*",
             "User-Agent": "InkStock",
             "Content-Type": "application/json",
             "Authorization": KEYS["pexels"]
         }
 
+    def get_params(self):
         params = {}
         if self.query:
             params["query"] = self.query
@@ -59,39 +62,50 @@ class PexelsPage(RemotePage):
 
         params["per_page"] = self.remote_source.items_per_page
         params["page"] = self.page_no + 1
+        return params
+
+    def parse_response(self, response_json):
+        photos = response_json["photos"]
+        if len(photos) == 0:
+            yield NoMoreResultsFile(self.query)
+            return
+
+        for photo in photos:
+            info = {
+                "id": photo["id"],
+                "width": photo["width"],
+                "height": photo["height"],
+                "url": photo["url"],
+                "photographer": photo["photographer"],
+                "photographer_url": photo["photographer_url"],
+                "photographer_id": photo["photographer_id"],
+                "avg_color": photo["avg_color"],
+                "thumbnail": photo["src"]["tiny"],
+                "file": photo["src"][self.remote_source.options["size"]],
+                "name": photo["alt"],
+                "license": "https://www.pexels.com/license/"
+            }
+
+            yield PexelsFile(self.remote_source, info, self.headers)
 
+    def get_page_content(self):
         try:
             response = self.remote_source.session.request(
-                "GET", self.remote_source.reqUrl, params=params, headers=headers_list)
-
-            photos = response.json()["photos"]
-            if len(photos) == 0:
-                yield NoMoreResultsFile(self.query)
-                return
-
-            for photo in photos:
-                info = {
-                    "id": photo["id"],
-                    "width": photo["width"],
-                    "height": photo["height"],
-                    "url": photo["url"],
-                    "photographer": photo["photographer"],
-                    "photographer_url": photo["photographer_url"],
-                    "photographer_id": photo["photographer_id"],
-                    "avg_color": photo["avg_color"],
-                    "thumbnail": photo["src"]["tiny"],
-                    "file": photo["src"][self.remote_source.options["size"]],
-                    "name": photo["alt"],
-                    "license": "https://www.pexels.com/license/"
-                }
-
-                file = PexelsFile(self.remote_source, info, headers_list)
-                yield file
-
+                "GET", self.remote_source.reqUrl, params=self.get_params(), headers=self.headers)
+            yield from self.parse_response(response.json())
         except Exception as e:
             print(str('Exception: ' + e))
             return []
 
+    async def get_page_content_async(self):
+        try:
+            response = await async_session.session.get_json(
+                self.remote_source.reqUrl, params=self.get_params(), headers=self.headers)
+            return list(self.parse_response(response))
+        except Exception as e:
+            print(f"Exception: {e}")
+            return []
+
 
 class Pexels(RemoteSource, OptionsChangeListener):
     name = "Pexels"
@@ -103,6 +117,8 @@ class Pexels(RemoteSource, OptionsChangeListener):
     is_default = False
     is_enabled = True
     items_per_page = 12
+    prefetch_depth = 1
+    max_concurrent_tasks = 12
     reqUrl = "https://api.pexels.com/v1/search"
     window_cls = PexelsWindow
     source_type = SourceType.PHOTO
@@ -131,7 +147,7 @@ class Pexels(RemoteSource, OptionsChangeListener):
         page = PexelsPage(self, self.current_page, self.query)
         self.window.add_page(page)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         query = query.lower().replace(' ', '_')
         self.query = query
@@ -1,3 +1,4 @@
+from core.network import async_session
 from core.utils import asyncme
 from keys import KEYS
 from sources.source import RemoteSource, SourceType, sanitize_query
@@ -37,19 +38,21 @@ class PixabayFile(RemoteFile):
         # self.source.session.head(view_trigger, headers=self.headers)
         return self.source.to_local_file(self.info["thumbnail"], self.file_name, self.headers)
 
+    async def get_thumbnail_async(self):
+        return await self.source.to_local_file_async(self.info["thumbnail"], self.file_name, self.headers)
+
 
 class PixabayPage(RemotePage):
     def __init__(self, remote_source, page_no: int, query):
         super().__init__(remote_source, page_no)
         self.query = query
-
-    def get_page_content(self):
-        headers_list = {
+        self.headers = {
             "Accept": "*/*",
             "User-Agent": "InkStock",
             "Content-Type": "application/json",
         }
 
+    def get_params(self):
         params = {"order": self.remote_source.options["order"],
                   "orientation": self.remote_source.options["orientation"],
                   "image_type": self.remote_source.options["image_type"]}
@@ -67,34 +70,44 @@ class PixabayPage(RemotePage):
         params["per_page"] = self.remote_source.items_per_page
         params["page"] = self.page_no + 1
         params["key"] = KEYS["pixabay"]
+        return params
+
+    def parse_response(self, json_response):
+        photos = json_response["hits"]
+        if len(photos) == 0:
+            yield NoMoreResultsFile(self.query)
+            return
+
+        for photo in photos:
+            info = {
+                "id": photo["id"],
+                "url": photo["largeImageURL"],
+                "user": photo["user"],
+                "user_url": "https://pixabay.com/users/" + photo["user"] + "-" + str(photo["user_id"]),
+                "user_id": photo["user_id"],
+                "thumbnail": photo["webformatURL"],
+                "file": photo["largeImageURL"],
+                "name": "",
+                "view_link": photo["pageURL"],
+                "license": "https://pixabay.com/service/license/"
+            }
+
+            yield PixabayFile(self.remote_source, info, self.headers)
 
+    def get_page_content(self):
         try:
             response = self.remote_source.session.request(
-                "GET", self.remote_source.reqUrl, params=params, headers=headers_list)
-
-            json_response = response.json()
-            photos = json_response["hits"]
-            if len(photos) == 0:
-                yield NoMoreResultsFile(self.query)
-                return
-
-            for photo in photos:
-                info = {
-                    "id": photo["id"],
-                    "url": photo["largeImageURL"],
-                    "user": photo["user"],
-                    "user_url": "https://pixabay.com/users/" + photo["user"] + "-" + str(photo["user_id"]),
-                    "user_id": photo["user_id"],
-                    "thumbnail": photo["webformatURL"],
-                    "file": photo["largeImageURL"],
-                    "name": "",
-                    "view_link": photo["pageURL"],
-                    "license": "https://pixabay.com/service/license/"
-                }
-
-                file = PixabayFile(self.remote_source, info, headers_list)
-                yield file
+                "GET", self.remote_source.reqUrl, params=self.get_params(), headers=self.headers)
+            yield from self.parse_response(response.json())
+        except Exception as err:
+            print(f"Error(Pixabay) couldn't fetch images {err}")
+            return []
 
+    async def get_page_content_async(self):
+        try:
+            response = await async_session.session.get_json(
+                self.remote_source.reqUrl, params=self.get_params(), headers=self.headers)
+            return list(self.parse_response(response))
         except Exception as err:
             print(f"Error(Pixabay) couldn't fetch images {err}")
             return []
@@ -109,6 +122,8 @@ class Pixabay(RemoteSource, OptionsChangeListener):
     is_default = False
     is_enabled = True
     items_per_page = 12
+    prefetch_depth = 1
+    max_concurrent_tasks = 12
     options_window_width = 350
     reqUrl = "https://pixabay.com/api/"
     window_cls = PixabayWindow
@@ -149,7 +164,7 @@ class Pixabay(RemoteSource, OptionsChangeListener):
         page = PixabayPage(self, self.current_page, self.query)
         self.window.add_page(page)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         query = query.lower().replace(' ', '_')
         self.query = query
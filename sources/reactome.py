@@ -129,7 +129,7 @@ class ReactomeSource(RemoteSource):
             page = ReactomePage(self, page_no, results)
             self.window.add_page(page)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         self.results = []
         self.query = sanitize_query(query)
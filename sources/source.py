@@ -6,19 +6,16 @@ import logging
 import os
 import sys
 from abc import ABC
-from asyncio import Queue
-from threading import Thread
 
+import aiohttp
 import requests
-from cachecontrol import CacheControlAdapter
-from cachecontrol.caches.file_cache import FileCache
-from cachecontrol.heuristics import ExpiresAfter
 from gi.repository import Gtk, Gdk
 
 from core.gui.pixmap_manager import PixmapManager
 from core.utils import asyncme
 from sources.source_file import RemoteFile
-from core.network.adapter import FileAdapter
+from core.network import async_session, session
+from core.runtime import runtime
 from sources.source_page import RemotePage
 from windows.basic_window import BasicWindow
 
@@ -41,6 +38,15 @@ class RemoteSource(ABC):
     is_default = False
     is_enabled = True
     items_per_page = 10
+    # maximum number of queued background jobs (thumbnail downloads, tasks...)
+    # this source runs at the same time
+    max_concurrent_tasks = 4
+    # number of pages after the shown one whose content and thumbnails
+    # are fetched in the background, so "Load more" doesn't have to wait
+    prefetch_depth = 0
+    # search while the query is typed instead of when it's submitted,
+    # for sources searching local data that can keep up with it
+    search_as_you_type = False
     options_window_width = 300
     window_cls = BasicWindow
     window: BasicWindow = None
@@ -59,22 +65,14 @@ class RemoteSource(ABC):
         self.current_page = 0
         self.import_manager = import_manager
         self.options_window = None
-        self.session = requests.session()
+        # all sources share one connection pool and http cache
+        self.session = session.get_session()
         self.cache_dir = cache_dir
 
-        # asynchronous queue to process all background activities
-        # by this source, assigned on attachment of source window
-        self.task_queue = None
-        self.task_loop = None
-
-        self.session.mount(
-            "https://",
-            CacheControlAdapter(
-                cache=FileCache(cache_dir),
-                heuristic=ExpiresAfter(days=1),
-            ),
-        )
-        self.session.mount('file://', FileAdapter())
+        # background activities of this source, run on the app's shared loop and thread pool
+        self.tasks = runtime.namespace(type(self).__name__, self.max_concurrent_tasks)
+        # handed to the jobs of the current results, replaced when they're cleared
+        self.search_token = asyncme.CancelToken()
 
     def get_page(self, page_no: int):
         """
@@ -86,7 +84,7 @@ class RemoteSource(ABC):
             "You must implement a get_page function for this remote source!"
         )
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         """
         Search for the given query and returns first page
@@ -98,34 +96,28 @@ class RemoteSource(ABC):
     def on_window_attached(self, window: BasicWindow, window_pane: Gtk.Paned):
         self.window = window
 
-        # start async tasks queue in background thread
-        self.task_queue: Queue = None
-        self.task_loop = asyncio.new_event_loop()
-        task_thread = Thread(target=self.start_background_loop, daemon=True)
-        task_thread.start()
-        while not self.task_loop.is_running():
-            pass
+    @property
+    def task_loop(self):
+        return runtime.loop
 
-    def start_background_loop(self) -> None:
-        asyncio.set_event_loop(self.task_loop)
-        self.task_queue = Queue()
-        self.task_loop.run_until_complete(self.consume_task())
+    def add_task_to_queue(self, fn, callback, *args, cancel_token: asyncme.CancelToken = None, **kwargs):
+        """Queues fn(*args, **kwargs) to be run in the background, it's skipped
+        if `cancel_token` is cancelled by the time it would start"""
+        self.tasks.add(fn, callback, *args, cancel_token=cancel_token, **kwargs)
 
-    def add_task_to_queue(self, fn, callback, *args, **kwargs):
-        asyncio.run_coroutine_threadsafe(self.task_queue.put((fn, callback, args, kwargs)), loop=self.task_loop)
+    def cancel_search_jobs(self):
+        """Cancels the queued jobs of the current results and starts a new search token"""
+        self.search_token.cancel()
+        self.search_token = asyncme.CancelToken()
 
-    async def consume_task(self):
-        while True:
-            fn, callback, args, kwargs = await self.task_queue.get()
-            try:
-                if inspect.iscoroutinefunction(fn):
-                    result = await fn(*args, **kwargs)
-                else:
-                    result = fn(*args, **kwargs)
-                callback(result=result, error=None)
-            except Exception as err:
-                callback(result=None, error=err)
-            self.task_queue.task_done()
+    async def run_blocking(self, fn, *args, **kwargs):
+        """Runs a blocking function in the shared thread pool and waits for its result"""
+        return await runtime.run_blocking(fn, *args, **kwargs)
+
+    def run_in_loop(self, coro):
+        """Runs a coroutine in the background loop from any other thread
+        and blocks until its result is ready"""
+        return runtime.submit(coro).result()
 
     def file_selected(self, file: RemoteFile):
         pass
@@ -180,9 +172,6 @@ class RemoteSource(ABC):
             for item in multi_items:
                 self.pix_manager.get_pixbuf_for_type(item.data, "multi", self.update_item, item)
 
-    def __del__(self):
-        self.session.close()
-
     def to_local_file(self, url, name, headers=None, content=False):
         """Get a remote url and turn it into a local file"""
         filepath = os.path.join(self.cache_dir, name)
@@ -214,6 +203,46 @@ class RemoteSource(ABC):
                         return filepath
         return None
 
+    async def to_local_file_async(self, url, name, headers=None, content=False):
+        """Coroutine version of to_local_file using the shared async session,
+        allowing many files to be fetched at the same time on one loop.
+        Responses come from the session's http cache while they're fresh"""
+        if url.startswith("file://"):
+            return await self.run_blocking(self.to_local_file, url, name, headers, content)
+        filepath = os.path.join(self.cache_dir, name)
+        if not headers:
+            headers = {"User-Agent": "Inkscape"}
+        try:
+            remote = await async_session.session.get(url, headers=headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+        if remote.status_code == 200:
+            if content:
+                return remote.content
+            if not remote.content:
+                return None
+            # a response from the http cache that's already in the file doesn't need writing again
+            if not (remote.from_cache and await self.run_blocking(self.file_has_content, filepath, remote.content)):
+                await self.run_blocking(self.write_file, filepath, remote.content)
+            return filepath
+        return None
+
+    @staticmethod
+    def file_has_content(filepath, content: bytes) -> bool:
+        try:
+            if os.path.getsize(filepath) != len(content):
+                return False
+            with open(filepath, "rb") as fhl:
+                return fhl.read() == content
+        except OSError:
+            return False
+
+    @staticmethod
+    def write_file(filepath, content: bytes):
+        with open(filepath, "wb") as fhl:
+            fhl.write(content)
+
     @classmethod
     def load(cls, name):
         """Load the file or directory of remote sources"""
@@ -231,21 +260,7 @@ class RemoteSource(ABC):
 
     @asyncme.mainloop_only
     def update_item(self, pic_path, item):
-        css = self.pix_manager.style
-        css = css.format(id=item.id, url=pic_path)
-        item.style_prov.load_from_data(bytes(css, "utf8"))
-        item.style_ctx.add_provider_for_screen(Gdk.Screen.get_default(), item.style_prov,
-                                               Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
-        # css_prov = Gtk.CssProvider()
-        # css_prov.load_from_data(bytes(css, "utf8"))
-        # item.style_ctx.remove_provider_for_screen(Gdk.Screen.get_default(), item.style_prov)
-        # item.style_ctx.add_provider_for_screen(Gdk.Screen.get_default(), css_prov,
-        #                                               Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
-        # item.style_prov = css_prov
-
-        # Fixme: Deleting item immediately here, makes it not appear
-        # Wait for some signal from gtk before deleting
-        # asyncme.run_or_none(os.remove)(pic_path)
+        item.set_thumbnail(pic_path, self.pix_manager)
 
 
 def sanitize_query(query: str):
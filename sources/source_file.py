@@ -1,3 +1,6 @@
+import asyncio
+from typing import Optional
+
 from core.constants import LICENSES
 from tasks.task import Task
 from lxml import etree
@@ -8,6 +11,50 @@ class RemoteFile:
     def get_thumbnail(self):
         return self.source.to_local_file(self.info["thumbnail"], self.file_name)
 
+    def get_thumbnail_data(self) -> Optional[bytes]:
+        """Returns the thumbnail of files that have it in memory, which is rendered without
+        being written to a file. None for thumbnails that have to be fetched"""
+        return None
+
+    async def get_thumbnail_async(self):
+        """Coroutine version of get_thumbnail.
+        Files that override get_thumbnail without an async version
+        have it run in the source's thread pool instead"""
+        if type(self).get_thumbnail is RemoteFile.get_thumbnail:
+            return await self.source.to_local_file_async(self.info["thumbnail"], self.file_name)
+        return await self.source.run_blocking(self.get_thumbnail)
+
+    async def prefetch_thumbnail(self):
+        """Fetches the thumbnail ahead of the file being shown, in the source's loop"""
+        if self._prefetch is None:
+            self._prefetch = asyncio.ensure_future(self.get_thumbnail_ahead())
+        try:
+            await asyncio.shield(self._prefetch)
+        except asyncio.CancelledError:
+            pass
+
+    async def get_thumbnail_ahead(self):
+        """Fetches the thumbnail for a prefetch, files that report views should do so in load_thumbnail"""
+        return await self.get_thumbnail_async()
+
+    def cancel_prefetch(self):
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch and not prefetch.done():
+            self.source.task_loop.call_soon_threadsafe(prefetch.cancel)
+
+    async def load_thumbnail(self):
+        """Returns the prefetched thumbnail if there is one, else fetches it.
+        A prefetched thumbnail is only used once, later loads fetch it again"""
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is not None:
+            try:
+                filepath = await prefetch
+            except (asyncio.CancelledError, Exception):
+                filepath = None
+            if filepath:
+                return filepath
+        return await self.get_thumbnail_async()
+
     def get_file(self):
         return self.info["file"]
 
@@ -24,6 +71,8 @@ class RemoteFile:
         self.source = source
         self.tasks: list[Task] = []
         self.show_name = False
+        # thumbnail download started by the results page prefetch
+        self._prefetch: Optional[asyncio.Future] = None
 
     @property
     def license(self):
@@ -149,6 +198,9 @@ class HumaansSvg:
             self._trans_group.attrib[
                 "transform"] = f"translate({int(self._width) / 2} {int(self._height) / 2}) scale(1.2)"
 
+    def to_bytes(self) -> bytes:
+        return etree.tostring(self._svgTree, encoding="utf-8")
+
     def save_to_file(self, filepath):
         xml = etree.tostring(self._svgTree, encoding="unicode")
         with open(filepath, mode="w+") as f:
@@ -12,6 +12,13 @@ class RemotePage:
             "You must implement a get_page_content function for this remote page!"
         )
 
+    async def get_page_content_async(self):
+        """Returns the page's files as a list.
+            Pages fetching their content over http should override this to use the
+            shared async session, by default get_page_content runs in the source's thread pool
+        """
+        return await self.remote_source.run_blocking(lambda: list(self.get_page_content()))
+
 
 class NoResultsPage:
     def __init__(self, query: str):
@@ -1,13 +1,16 @@
-import json
-import zlib
+import os
 from abc import ABC, abstractmethod
+from functools import partial
 from os.path import exists
 
 from gi.repository import Gtk
 
-from core.utils import asyncme
+from core.constants import CACHE_DIR
+from core.utils import asyncme, icon_pack
+from core.utils.search_index import IncrementalSearch, SearchIndex
 from sources.source import RemoteSource, sanitize_query
 from sources.source_file import RemoteFile
+from tasks.batch_recolor import batch_recolor
 from tasks.svg_color_replace import SvgColorReplace
 from windows.basic_window import BasicWindow
 from windows.options_window import OptionType, OptionsWindow, ColorOption
@@ -24,6 +27,9 @@ class SvgSource(RemoteSource, ViewChangeListener, ABC):
     def __init__(self, cache_dir, import_manager):
         super().__init__(cache_dir, import_manager)
         self.icon_map = None
+        self.search_index = None
+        self.indexed_map = None
+        self.incremental_search = None
         self.query = ""
         self.last_selected_file = None
         self.color_ext = SvgColorReplace()
@@ -32,7 +38,9 @@ class SvgSource(RemoteSource, ViewChangeListener, ABC):
         self.options = {}
         self.search_color = None
         self.options_window = OptionsWindow(self)
-        self.options_window.set_option("query", None, OptionType.SEARCH, f"Search {self.name}")
+        search_field = self.options_window.set_option("query", None, OptionType.SEARCH, f"Search {self.name}")
+        if self.search_as_you_type:
+            search_field.search_as_you_type()
         self.search_color_option: ColorOption = self.options_window.set_option(
             "search_color", None, OptionType.COLOR, "Set default search color")
         self.search_color_option.set_color(self.default_svg_color)
@@ -46,6 +54,17 @@ class SvgSource(RemoteSource, ViewChangeListener, ABC):
                 self.icon_map = self.read_map_file(self.json_path)
         # ---------
 
+    def find_icons(self, query) -> list:
+        """Returns the keys of icon_map matching `query`, names starting with it first"""
+        # the index is built on first search and rebuilt whenever a new icon map is loaded
+        if self.search_index is None or self.indexed_map is not self.icon_map:
+            self.search_index = SearchIndex(self.icon_map)
+            self.indexed_map = self.icon_map
+            # a query extending the previous one only rechecks its results
+            self.incremental_search = IncrementalSearch(self.search_index.search, self.search_index.narrow,
+                                                        self.search_index.can_narrow)
+        return [self.search_index.keys[index] for index in self.incremental_search.search(query)]
+
     @abstractmethod
     def get_page(self, page_no: int):
         pass
@@ -85,15 +104,48 @@ class SvgSource(RemoteSource, ViewChangeListener, ABC):
                          if (key.startswith("fill") or key.startswith("stroke")) and value]
 
         if color_changes:
-            add_color_changes_to_items(color_changes, multi_items)
             add_color_changes_to_items(color_changes, single_items)
-            self.update_items_sequentially(single_items, single_item, multi_items)
+            if single_item:
+                add_color_changes_to_items(color_changes, multi_items)
+                self.update_items_sequentially(single_items, single_item, multi_items)
+            else:
+                self.recolor_items(color_changes, multi_items)
+            return
+
+    def recolor_items(self, color_changes: list[tuple], items: list[FlowBoxChildWithData]):
+        """Recolours multi view thumbnails all at once, in the batch recolour processes"""
+        if not items:
             return
+        new_fill_colors, new_stroke_colors = split_color_changes(color_changes)
+        token = self.search_token
+
+        def update_item(pic_path, item, file):
+            # the child could have been recycled for another result
+            if item.data is file:
+                self.update_item(pic_path, item)
+
+        def on_render(file, path):
+            item = items[files.index(file)]
+            asyncme.dispatcher.post(update_item, path, item, file)
+
+        def cb(result, error):
+            if error:
+                print(f"Error occurred in task(Batch Recolour): {error}")
+            renders = result or [None] * len(items)
+            # files that couldn't be recoloured in the batch are rendered one by one
+            for item, path in zip(items, renders):
+                if not path and not token.cancelled:
+                    self.pix_manager.get_pixbuf_for_type(item.data, "multi", self.update_item, item,
+                                                         cancel_token=token)
+
+        files = [item.data for item in items]
+        self.add_task_to_queue(partial(batch_recolor.recolor, on_render=on_render, cancel_token=token), cb,
+                               files, new_fill_colors, new_stroke_colors, self.pix_manager, cancel_token=token)
 
     def clear_color_options(self):
         self.options_window.remove_option("color_group")
 
-    @asyncme.mainloop_only
+    @asyncme.mainloop_post
     def show_svg_colors(self, file, fill_colors, stroke_colors):
         #  _, fill_colors, stroke_colors = self.color_ext.extract_color(file.get_thumbnail())
 
@@ -171,15 +223,8 @@ class SvgSource(RemoteSource, ViewChangeListener, ABC):
 
     @classmethod
     def read_map_file(cls, path):
-        with open(path, mode='rb') as f:
-            if cls.json_is_compressed:
-                m = json.loads(zlib.decompress(f.read()))
-            else:
-                m = json.load(f)
-            s = m
-            if type(m) is dict:
-                s = dict(sorted(m.items()))
-        return s
+        # opened as a packed icon set, svgs are only decompressed when they are looked up
+        return icon_pack.load_icon_map(path, cls.json_is_compressed, os.path.join(CACHE_DIR, "packs"))
 
     def on_window_attached(self, window: BasicWindow, window_pane):
         super().on_window_attached(window, window_pane)
@@ -191,37 +236,27 @@ class SvgSource(RemoteSource, ViewChangeListener, ABC):
         pass
 
 
+def split_color_changes(color_changes: list[tuple]) -> tuple[dict, dict]:
+    """Splits ("fill_<old color>", new color) and ("stroke_<old color>", new color) options into colour maps"""
+    new_fill_colors = {}
+    new_stroke_colors = {}
+    for key, new_color in color_changes:
+        if key.startswith("fill"):
+            new_fill_colors[key.removeprefix("fill_")] = new_color
+        elif key.startswith("stroke"):
+            new_stroke_colors[key.removeprefix("stroke_")] = new_color
+    return new_fill_colors, new_stroke_colors
+
+
 def add_color_changes_to_items(color_changes: list[tuple], items: list[FlowBoxChildWithData]):
     if not items:
         return
 
-    fill_color_changes = list(filter(lambda x: x[0].startswith("fill"), color_changes))
-    stroke_color_changes = list(filter(lambda x: x[0].startswith("stroke"), color_changes))
-
     color_replace = SvgColorReplace()
     color_replace.is_active = True
-
-    # update fill colors for color replace task
-    for color in fill_color_changes:
-        old_color = color[0].removeprefix("fill_")
-        new_color = color[1]
-        color_replace.new_fill_colors[old_color] = new_color
-
-    # update stroke colors for color replace task
-    for color in stroke_color_changes:
-        old_color = color[0].removeprefix("stroke_")
-        new_color = color[1]
-        color_replace.new_stroke_colors[old_color] = new_color
+    color_replace.new_fill_colors, color_replace.new_stroke_colors = split_color_changes(color_changes)
 
     for item in items:
-        file: RemoteFile = item.data
-        # avoid adding duplicate color replace task
-        for task in file.tasks:
-            if isinstance(task, SvgColorReplace):
-                file.tasks.remove(task)
         # the color task has to be the first item before other
         # tasks are applied to svg
-        file.tasks.insert(0, color_replace)
-
-
-
+        color_replace.add_to_file(item.data)
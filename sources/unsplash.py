@@ -1,3 +1,4 @@
+from core.network import async_session
 from core.utils import asyncme
 from keys import KEYS
 from sources.source import RemoteSource, SourceType, sanitize_query
@@ -37,6 +38,20 @@ class UnsplashFile(RemoteFile):
         self.source.session.head(view_trigger, headers=self.headers)
         return self.source.to_local_file(self.info["thumbnail"], self.file_name, self.headers)
 
+    async def get_thumbnail_async(self):
+        view_trigger = self.info["view_link"]
+        await async_session.session.head(view_trigger, headers=self.headers)
+        return await self.source.to_local_file_async(self.info["thumbnail"], self.file_name, self.headers)
+
+    async def get_thumbnail_ahead(self):
+        # the view is only reported once the photo is actually shown
+        return await self.source.to_local_file_async(self.info["thumbnail"], self.file_name, self.headers)
+
+    async def load_thumbnail(self):
+        if self._prefetch is not None:
+            await async_session.session.head(self.info["view_link"], headers=self.headers)
+        return await super().load_thumbnail()
+
     def get_file(self):
         download_trigger = self.info["download_link"]
         self.source.session.head(download_trigger, headers=self.headers)
@@ -48,9 +63,7 @@ class UnsplashPage(RemotePage):
     def __init__(self, remote_source, page_no: int, query):
         super().__init__(remote_source, page_no)
         self.query = query
-
-    def get_page_content(self):
-        headers_list = {
+        self.headers = {
             "Accept": "*/*",
             "User-Agent": "InkStock",
             "Content-Type": "application/json",
@@ -58,13 +71,17 @@ class UnsplashPage(RemotePage):
             "Authorization": KEYS["unsplash"]
         }
 
+    @property
+    def searching(self):
+        return self.remote_source.reqUrl == "https://api.unsplash.com/search/photos"
+
+    def get_params(self):
         params = {}
         if self.query:
             params["query"] = self.query
         params["order_by"] = self.remote_source.options["order_by"]
 
-        searching = self.remote_source.reqUrl == "https://api.unsplash.com/search/photos"
-        if searching:
+        if self.searching:
             if self.remote_source.options["orientation"] != "all":
                 params["orientation"] = self.remote_source.options["orientation"]
             params["content_filter"] = self.remote_source.options["content_filter"]
@@ -78,43 +95,53 @@ class UnsplashPage(RemotePage):
 
         params["per_page"] = self.remote_source.items_per_page
         params["page"] = self.page_no + 1
+        return params
+
+    def parse_response(self, response_json):
+        if self.searching:
+            json_response = response_json["results"]
+        else:
+            json_response = response_json
+
+        if len(json_response) == 0:
+            yield NoMoreResultsFile(query=self.query)
+
+        for photo in json_response:
+            info = {
+                "id": photo["id"],
+                "width": photo["width"],
+                "height": photo["height"],
+                "url": photo["urls"]["full"],
+                "photographer": photo["user"]["name"],
+                "photographer_url": photo["user"]["portfolio_url"],
+                "photographer_id": photo["user"]["id"],
+                "color": photo["color"],
+                "thumbnail": photo["urls"]["small"],
+                "file": photo["urls"]["full"],
+                "name": "" if not photo["description"] else photo["description"],
+                "view_link": photo["links"]["self"],
+                "download_link": photo["links"]["download"],
+                "license": "https://unsplash.com/license"
+            }
+
+            yield UnsplashFile(self.remote_source, info, self.headers)
 
+    def get_page_content(self):
         try:
             response = self.remote_source.session.request(
-                "GET", self.remote_source.reqUrl, params=params, headers=headers_list)
-            photos = []
-            if searching:
-                json_response = response.json()["results"]
-            else:
-                json_response = response.json()
-
-            if len(json_response) == 0:
-                yield NoMoreResultsFile(query=self.query)
-
-            for photo in json_response:
-                info = {
-                    "id": photo["id"],
-                    "width": photo["width"],
-                    "height": photo["height"],
-                    "url": photo["urls"]["full"],
-                    "photographer": photo["user"]["name"],
-                    "photographer_url": photo["user"]["portfolio_url"],
-                    "photographer_id": photo["user"]["id"],
-                    "color": photo["color"],
-                    "thumbnail": photo["urls"]["small"],
-                    "file": photo["urls"]["full"],
-                    "name": "" if not photo["description"] else photo["description"],
-                    "view_link": photo["links"]["self"],
-                    "download_link": photo["links"]["download"],
-                    "license": "https://unsplash.com/license"
-                }
-
-                file = UnsplashFile(self.remote_source, info, headers_list)
-                yield file
-                # photos.append(file)
-            # return photos
+                "GET", self.remote_source.reqUrl, params=self.get_params(), headers=self.headers)
+            yield from self.parse_response(response.json())
+        except Exception as err:
+            print("Error trying to establish connection")
+
+    async def get_page_content_async(self):
+        try:
+            response = await async_session.session.get_json(
+                self.remote_source.reqUrl, params=self.get_params(), headers=self.headers)
+            return list(self.parse_response(response))
         except Exception as err:
             print("Error trying to establish connection")
+            return []
 
 
 class Unsplash(RemoteSource, OptionsChangeListener):
@@ -128,6 +155,8 @@ class Unsplash(RemoteSource, OptionsChangeListener):
     is_default = False
     is_enabled = True
     items_per_page = 12
+    prefetch_depth = 1
+    max_concurrent_tasks = 12
     options_window_width = 350
     reqUrl = "https://api.unsplash.com/search/photos"
     window_cls = UnsplashWindow
@@ -163,7 +192,7 @@ class Unsplash(RemoteSource, OptionsChangeListener):
         page = UnsplashPage(self, self.current_page, self.query)
         self.window.add_page(page)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         self.query = query
         self.window.clear_pages()
@@ -19,6 +19,7 @@
 
 from core.constants import CACHE_DIR, LICENSES
 from core.gui.pixmap_manager import PixmapManager, SIZE_ASPECT_GROW
+from core.network import async_session
 from core.utils import asyncme
 from sources.source import RemoteSource, sanitize_query, SourceType
 from sources.source_file import RemoteFile
@@ -113,6 +114,7 @@ class WikiMediaSource(RemoteSource):
     is_enabled = True
     options_window_width = 300
     items_per_page = 16
+    max_concurrent_tasks = 8
     window_cls = WikiMediaWindow
     base_url = "https://commons.wikimedia.org/w/api.php"
 
@@ -133,7 +135,7 @@ class WikiMediaSource(RemoteSource):
             page = WikiMediaPage(self, page_no, results)
             self.window.add_page(page)
 
-    @asyncme.run_or_none
+    @asyncme.run_latest
     def search(self, query):
         self.results = []
         self.query = sanitize_query(query)
@@ -159,7 +161,7 @@ class WikiMediaSource(RemoteSource):
         }
         pages = []
         try:
-            response = self.session.get(self.base_url, params=params).json()
+            response = self.run_in_loop(async_session.session.get_json(self.base_url, params=params))
             if "error" in response:
                 raise IOError(response["error"]["info"])
             pages = response["query"]["pages"].values()
@@ -0,0 +1,173 @@
+"""
+Recolouring many svgs at once.
+
+Parsing, recolouring and rendering an svg is cpu bound and holds the GIL for most of it, so a
+page of recoloured icons took as long as recolouring them one after the other. A batch is split
+in chunks that run in a pool of processes, each rendering its svgs straight into the render cache.
+Renders of thumbnails in memory aren't saved, their pixels are handed back to be kept in memory.
+"""
+import asyncio
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Union
+
+from gi.repository import GdkPixbuf, GLib
+
+from core.gui.render_cache import save_png
+from sources.source_file import RemoteFile
+from tasks.svg_color_replace import SvgColorReplace
+
+MAX_WORKERS = os.cpu_count() or 1
+# chunks per process, fewer round trips while keeping every process busy till the end
+CHUNKS_PER_WORKER = 2
+
+
+# a render's pixels as (pixels, has alpha, bits per sample, width, height, rowstride)
+Pixels = tuple[bytes, bool, int, int, int, int]
+
+
+def _to_pixels(pixbuf: GdkPixbuf.Pixbuf) -> Pixels:
+    return (pixbuf.get_pixels(), pixbuf.get_has_alpha(), pixbuf.get_bits_per_sample(),
+            pixbuf.get_width(), pixbuf.get_height(), pixbuf.get_rowstride())
+
+
+def _from_pixels(pixels: Pixels) -> GdkPixbuf.Pixbuf:
+    data, has_alpha, bits_per_sample, width, height, rowstride = pixels
+    return GdkPixbuf.Pixbuf.new_from_bytes(GLib.Bytes.new(data), GdkPixbuf.Colorspace.RGB, has_alpha,
+                                           bits_per_sample, width, height, rowstride)
+
+
+def _render_chunk(pix_manager, display_type, jobs) -> list[Union[str, Pixels, None]]:
+    """Runs in a pool process, returns the render of each job"""
+    return [_render_job(pix_manager, display_type, *job) for job in jobs]
+
+
+def _render_job(pix_manager, display_type, thumbnail, color_maps, output_path) -> Union[str, Pixels, None]:
+    """
+    `thumbnail` is the svg itself for thumbnails in memory, else the path of its file.
+    Renders of files are saved to `output_path` and their path returned, renders of thumbnails
+    in memory are returned as pixels without being saved.
+    """
+    try:
+        if isinstance(thumbnail, bytes):
+            data = thumbnail
+        else:
+            with open(thumbnail, mode="rb") as f:
+                data = f.read()
+        for new_fill_colors, new_stroke_colors in color_maps:
+            task = SvgColorReplace()
+            task.new_fill_colors = new_fill_colors
+            task.new_stroke_colors = new_stroke_colors
+            data = task.recolor_bytes(data)
+
+        pixbuf = pix_manager.render_pixbuf(data, display_type)
+        if not pixbuf:
+            return None
+        if isinstance(thumbnail, bytes):
+            return _to_pixels(pixbuf)
+        return save_png(pixbuf, output_path)
+    except Exception as err:
+        print(f"Error occurred while recolouring {output_path or 'thumbnail'}: {err}")
+        return None
+
+
+class BatchRecolor:
+    """Recolours and renders files in a pool of `max_workers` processes, started when first needed"""
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawned, forking a process that runs Gtk and a few threads isn't safe
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def recolor(self, files: list[RemoteFile], new_fill_colors: dict, new_stroke_colors: dict, pix_manager,
+                      display_type="multi", on_render: Callable = None, cancel_token=None) -> list[Optional[str]]:
+        """
+        Makes the colour maps the colour replace task of every file and renders them as `display_type`.
+        Returns the path of each file's render, None for files that couldn't be rendered here,
+        which are left for the pixmap manager to render.
+        """
+        task = SvgColorReplace()
+        task.new_fill_colors = dict(new_fill_colors)
+        task.new_stroke_colors = dict(new_stroke_colors)
+        task.is_active = True
+        for file in files:
+            task.add_to_file(file)
+        return await self.render(files, pix_manager, display_type, on_render, cancel_token)
+
+    async def render(self, files: list[RemoteFile], pix_manager, display_type="multi", on_render: Callable = None,
+                     cancel_token=None) -> list[Optional[str]]:
+        """
+        Renders files with their colour replace tasks applied, reusing cached renders.
+        Render paths are for PixmapManager.load_render, renders of thumbnails in memory
+        aren't saved. on_render(file, path) is called as renders are done, in the loop's thread.
+        Files with other active tasks are skipped and get None.
+        """
+        async def load_thumbnail(file):
+            data = file.get_thumbnail_data()
+            return data if data is not None else await file.load_thumbnail()
+
+        renders: list[Optional[str]] = [None] * len(files)
+        thumbnails = await asyncio.gather(*(load_thumbnail(file) for file in files), return_exceptions=True)
+        jobs = []
+        for position, (file, thumbnail) in enumerate(zip(files, thumbnails)):
+            if isinstance(thumbnail, BaseException) or not thumbnail:
+                continue
+            if not isinstance(thumbnail, bytes) and not pix_manager.data_is_file(thumbnail):
+                continue
+            active_tasks = [task for task in file.tasks if task.is_active]
+            if not all(isinstance(task, SvgColorReplace) for task in active_tasks):
+                continue
+            key = pix_manager.render_key(thumbnail, display_type, active_tasks)
+            if not key:
+                continue
+            # renders of thumbnails in memory may only be in memory, checking doesn't save them
+            if pix_manager.render_cache.has_render(key):
+                path = pix_manager.render_cache.get_path(key)
+                renders[position] = path
+                if on_render:
+                    on_render(file, path)
+                continue
+            color_maps = [(dict(task.new_fill_colors), dict(task.new_stroke_colors)) for task in active_tasks]
+            # only renders of files are saved, renders of thumbnails in memory stay in memory
+            output_path = None if isinstance(thumbnail, bytes) else pix_manager.render_cache.get_path(key)
+            jobs.append((position, key, (thumbnail, color_maps, output_path)))
+
+        if not jobs or (cancel_token and cancel_token.cancelled):
+            return renders
+        if any(output_path for _, _, (_, _, output_path) in jobs):
+            os.makedirs(pix_manager.render_cache.renders_dir, exist_ok=True)
+
+        loop = asyncio.get_running_loop()
+        chunk_size = math.ceil(len(jobs) / (self.max_workers * CHUNKS_PER_WORKER))
+        chunks = [jobs[start:start + chunk_size] for start in range(0, len(jobs), chunk_size)]
+
+        async def run_chunk(chunk):
+            results = await loop.run_in_executor(self.executor, _render_chunk, pix_manager, display_type,
+                                                 [job for _, _, job in chunk])
+            for (position, key, _), result in zip(chunk, results):
+                path = result
+                if isinstance(result, tuple):
+                    path = pix_manager.render_cache.put(key, _from_pixels(result), save=False)
+                renders[position] = path
+                if path and on_render and not (cancel_token and cancel_token.cancelled):
+                    on_render(files[position], path)
+
+        await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        return renders
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# shared by every svg source
+batch_recolor = BatchRecolor()
@@ -1,12 +1,100 @@
+import hashlib
+import io
 import os.path
+import threading
+from collections import OrderedDict
 
 from lxml import etree
 
+from core.runtime import runtime
 from sources.source_file import RemoteFile
 from tasks.task import Task
 
+# parsed svgs kept in memory, thumbnails and selected files are a few KB each
+DOM_CACHE_SIZE = 256
+# attributes a recolour can change, restored once the recoloured svg is serialised
+RECOLORED_ATTRIBUTES = ("fill", "stroke", "style")
+
+
+class ColorIndex:
+    """A parsed svg with its elements indexed by fill and stroke colour"""
+
+    def __init__(self, svg, colors_fill: dict, colors_stroke: dict):
+        self.svg = svg
+        self.colors_fill = colors_fill
+        self.colors_stroke = colors_stroke
+        # the tree is shared, recolours change it in place and then put it back
+        self.lock = threading.Lock()
+
+
+class SvgDomCache:
+    """
+    Colour indexes of svg files, so a file is only parsed and walked once.
+    Indexes are kept per content, a file rewritten with the same svg (as thumbnails are each
+    time they're loaded) keeps its index, one with another svg is parsed again.
+    """
+
+    def __init__(self, max_items=DOM_CACHE_SIZE):
+        self.max_items = max_items
+        # path -> ((mtime, size), digest) of the file when it was last read
+        self._files = {}
+        self._indexes: OrderedDict[bytes, ColorIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_file(self, path, build) -> ColorIndex:
+        """Returns the index of a file, made with build(data) if the file changed since it was made"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            known = self._files.get(path)
+            if known and known[0] == signature and known[1] in self._indexes:
+                self._indexes.move_to_end(known[1])
+                return self._indexes[known[1]]
+
+        with open(path, mode="rb") as f:
+            data = f.read()
+        index = self.get_data(data, build)
+        with self._lock:
+            self._files[path] = (signature, self.digest(data))
+        return index
+
+    def get_data(self, data: bytes, build) -> ColorIndex:
+        digest = self.digest(data)
+        with self._lock:
+            index = self._indexes.get(digest)
+            if index:
+                self._indexes.move_to_end(digest)
+                return index
+
+        index = build(data)
+        with self._lock:
+            index = self._indexes.setdefault(digest, index)
+            self._indexes.move_to_end(digest)
+            while len(self._indexes) > self.max_items:
+                self._indexes.popitem(last=False)
+            if len(self._files) > self.max_items * 4:
+                self._files = {path: known for path, known in self._files.items() if known[1] in self._indexes}
+        return index
+
+    @staticmethod
+    def digest(data: bytes) -> bytes:
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self._indexes.clear()
+
+
+# shared by the colour panels and the recolour task of every file
+svg_dom_cache = SvgDomCache()
+
 
 class SvgColorReplace(Task):
+    dom_cache = svg_dom_cache
+    in_memory = True
+
     def __init__(self):
         self.element_types1 = ["path", "circle"]
         self.element_types2 = ["rect", "polygon", "line", "ellipse", "polyline"]
@@ -14,34 +102,77 @@ class SvgColorReplace(Task):
         self.new_stroke_colors = {}
 
     async def do_task(self, filepath) -> str:
+        # parsing, serialising and rewriting the file block, so they don't run in the loop
+        if self.is_active:
+            await runtime.run_blocking(self.recolor_file, filepath)
+        return filepath
 
+    async def do_task_on_data(self, data: bytes) -> bytes:
         if self.is_active:
-            svg, colors_fill, colors_stroke = await self.extract_color(filepath)
-            for old_color, new_color in self.new_fill_colors.items():
-                if old_color in colors_fill.keys():
-                    self.change_color_of_elements(new_color, colors_fill[old_color], "fill")
-            for old_color, new_color in self.new_stroke_colors.items():
-                if old_color in colors_stroke.keys():
-                    self.change_color_of_elements(new_color, colors_stroke[old_color], "stroke")
+            return await runtime.run_blocking(self.recolor_bytes, data)
+        return data
 
-            xml = etree.tostring(svg, encoding="unicode")
-            with open(filepath, mode="w+") as f:
-                f.write(xml)
+    def fingerprint(self):
+        return (type(self).__name__, sorted(self.new_fill_colors.items()), sorted(self.new_stroke_colors.items()))
 
-            # svg.write(filepath)
+    def add_to_file(self, file: RemoteFile):
+        """Makes this the colour replace task of `file`, first so other tasks get the recoloured svg"""
+        file.tasks[:] = [task for task in file.tasks if not isinstance(task, SvgColorReplace)]
+        file.tasks.insert(0, self)
 
-        return filepath
+    def recolor_file(self, filepath):
+        xml = self.recolor(self.dom_cache.get_file(filepath, self.index_colors))
+        with open(filepath, mode="w+") as f:
+            f.write(xml)
+
+    def recolor_bytes(self, data: bytes) -> bytes:
+        return self.recolor_data(data).encode()
+
+    def recolor_data(self, data: bytes) -> str:
+        return self.recolor(self.dom_cache.get_data(data, self.index_colors))
+
+    def recolor(self, index: ColorIndex) -> str:
+        """Returns the svg of `index` with the new colours, leaving the cached tree as it was"""
+        changes = [(new_color, index.colors_fill[old_color], "fill")
+                   for old_color, new_color in self.new_fill_colors.items() if old_color in index.colors_fill]
+        changes += [(new_color, index.colors_stroke[old_color], "stroke")
+                    for old_color, new_color in self.new_stroke_colors.items() if old_color in index.colors_stroke]
+
+        with index.lock:
+            saved = [(element, name, element.get(name)) for _, elements, _ in changes
+                     for element in elements for name in RECOLORED_ATTRIBUTES]
+            try:
+                for new_color, elements, attrib in changes:
+                    self.change_color_of_elements(new_color, elements, attrib)
+                return etree.tostring(index.svg, encoding="unicode")
+            finally:
+                for element, name, value in reversed(saved):
+                    if value is None:
+                        element.attrib.pop(name, None)
+                    else:
+                        element.attrib[name] = value
 
     async def extract_color(self, file):
-        colors_fill = {}
-        colors_stroke = {}
+        return await runtime.run_blocking(self.extract_color_blocking, file)
+
+    def extract_color_blocking(self, file):
         if isinstance(file, RemoteFile):
-            filepath = file.get_thumbnail()
-            svg = etree.parse(filepath)
+            data = file.get_thumbnail_data()
+            if data is not None:
+                index = self.dom_cache.get_data(data, self.index_colors)
+            else:
+                index = self.dom_cache.get_file(file.get_thumbnail(), self.index_colors)
         elif os.path.isfile(file):
-            svg = etree.parse(file)
+            index = self.dom_cache.get_file(file, self.index_colors)
         else:
-            svg = etree.fromstring(file.strip())
+            index = self.dom_cache.get_data(file.strip().encode(), self.index_colors)
+
+        return index.svg, index.colors_fill, index.colors_stroke
+
+    def index_colors(self, data: bytes) -> ColorIndex:
+        colors_fill = {}
+        colors_stroke = {}
+        svg = etree.parse(io.BytesIO(data))
 
         for element in svg.iter(tag=etree.Element):
             # Fill paths with no fill or stroke with black
@@ -69,7 +200,7 @@ class SvgColorReplace(Task):
                 colors_stroke.setdefault(stroke, [])
                 colors_stroke[stroke].append(element)
 
-        return svg, colors_fill, colors_stroke
+        return ColorIndex(svg, colors_fill, colors_stroke)
 
     def change_color_of_elements(self, new_color, elements, attrib):
         for element in elements:
@@ -0,0 +1,167 @@
+"""
+The async session's http cache, against a stand-in server on 127.0.0.1.
+
+Runs with the standard library's unittest (or pytest) from the repository root:
+
+    python -m unittest tests.test_async_session
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import types
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from core.network import async_session
+from core.network.async_session import DEFAULT_MAX_AGE, AsyncSession, HttpCache
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Mon, 05 Oct 2026 10:00:00 GMT"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers every path with its own body, the headers each test needs and 304s to matching validators"""
+
+    routes = {
+        "/max-age": {"Cache-Control": "max-age=60"},
+        "/default": {},
+        "/no-store": {"Cache-Control": "no-store"},
+        "/etag": {"Cache-Control": "max-age=0", "ETag": ETAG},
+        "/last-modified": {"Cache-Control": "max-age=0", "Last-Modified": LAST_MODIFIED},
+    }
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        self.server.requests.append((path, dict(self.headers)))
+        headers = self.routes.get(path)
+        if headers is None:
+            self.send_error(404)
+            return
+        not_modified = (self.headers.get("If-None-Match") == headers.get("ETag", object()) or
+                        self.headers.get("If-Modified-Since") == headers.get("Last-Modified", object()))
+        body = f"body of {path}".encode()
+        self.send_response(304 if not_modified else 200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if not_modified:
+            self.end_headers()
+            return
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpCacheTest(unittest.IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.cache_dir = tempfile.mkdtemp(prefix="inkstock_http_")
+        self.cache = HttpCache(cache_dir=self.cache_dir)
+        self.session = AsyncSession(cache=self.cache)
+
+    def tearDown(self):
+        self.session.close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def requests_to(self, path):
+        return [headers for request_path, headers in self.server.requests if request_path == path]
+
+    def cached_meta(self, path):
+        cached = self.cache.load(self.cache.key(self.base_url + path))
+        return cached[0] if cached else None
+
+    async def test_fresh_for_max_age(self):
+        first = await self.session.get(self.base_url + "/max-age")
+        second = await self.session.get(self.base_url + "/max-age")
+        self.assertEqual(first.content, b"body of /max-age")
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(len(self.requests_to("/max-age")), 1)
+        self.assertAlmostEqual(self.cached_meta("/max-age")["expires"], time.time() + 60, delta=5)
+
+    async def test_fresh_for_a_day_without_cache_headers(self):
+        await self.session.get(self.base_url + "/default")
+        second = await self.session.get(self.base_url + "/default")
+        self.assertTrue(second.from_cache)
+        self.assertEqual(len(self.requests_to("/default")), 1)
+        self.assertAlmostEqual(self.cached_meta("/default")["expires"], time.time() + DEFAULT_MAX_AGE, delta=5)
+
+    async def test_no_store_is_not_kept(self):
+        first = await self.session.get(self.base_url + "/no-store")
+        second = await self.session.get(self.base_url + "/no-store")
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(second.from_cache)
+        self.assertEqual(len(self.requests_to("/no-store")), 2)
+        self.assertIsNone(self.cached_meta("/no-store"))
+
+    async def test_uncached_get_skips_the_cache(self):
+        await self.session.get(self.base_url + "/max-age")
+        second = await self.session.get(self.base_url + "/max-age", cached=False)
+        self.assertFalse(second.from_cache)
+        self.assertEqual(len(self.requests_to("/max-age")), 2)
+
+    async def test_etag_revalidation(self):
+        await self.session.get(self.base_url + "/etag")
+        expires = self.cached_meta("/etag")["expires"]
+        second = await self.session.get(self.base_url + "/etag")
+        revalidation = self.requests_to("/etag")[1]
+        self.assertEqual(revalidation.get("If-None-Match"), ETAG)
+        # answered 304, the cached body is reused and kept for another max-age
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, b"body of /etag")
+        self.assertGreaterEqual(self.cached_meta("/etag")["expires"], expires)
+
+    async def test_last_modified_revalidation(self):
+        await self.session.get(self.base_url + "/last-modified")
+        second = await self.session.get(self.base_url + "/last-modified")
+        revalidation = self.requests_to("/last-modified")[1]
+        self.assertEqual(revalidation.get("If-Modified-Since"), LAST_MODIFIED)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.content, b"body of /last-modified")
+
+    async def test_to_local_file_async_skips_rewriting_cached_files(self):
+        try:
+            from sources.source import RemoteSource
+        except ImportError as err:
+            self.skipTest(f"sources need Gtk: {err}")
+        source = types.SimpleNamespace(cache_dir=self.cache_dir, run_blocking=async_session.runtime.run_blocking,
+                                       file_has_content=RemoteSource.file_has_content,
+                                       write_file=mock.Mock(side_effect=RemoteSource.write_file))
+        url = self.base_url + "/max-age"
+        with mock.patch.object(async_session, "session", self.session):
+            first = await RemoteSource.to_local_file_async(source, url, "max-age.txt")
+            second = await RemoteSource.to_local_file_async(source, url, "max-age.txt")
+            # a cached response that's no longer in the file is written again
+            os.remove(first)
+            third = await RemoteSource.to_local_file_async(source, url, "max-age.txt")
+        self.assertEqual(first, os.path.join(self.cache_dir, "max-age.txt"))
+        self.assertEqual(second, first)
+        self.assertEqual(third, first)
+        self.assertEqual(source.write_file.call_count, 2)
+        self.assertEqual(len(self.requests_to("/max-age")), 1)
+        with open(first, "rb") as f:
+            self.assertEqual(f.read(), b"body of /max-age")
+
+
+if __name__ == "__main__":
+    unittest.main()
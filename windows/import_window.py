@@ -1,5 +1,6 @@
 from gi.repository import Gtk, Gdk
 
+from core.gui.thumbnail import Thumbnail
 from core.gui.window import ChildWindow
 from core.utils import asyncme
 from sources.source_file import RemoteFile
@@ -42,7 +43,7 @@ class ImportItem(Gtk.FlowBoxChild):
         self.cancel: Gtk.Button = builder.get_object("import_cancel")
         self.result = builder.get_object("import_item")
         self.style_ctx: Gtk.StyleContext = self.result.get_style_context()
-        self.style_prov = None
+        self.thumbnail = Thumbnail(self.result)
         self.add(self.result)
         self.show()
 
@@ -106,8 +107,6 @@ class ImportResults(ChildWindow):
     @asyncme.mainloop_only
     def callback(self, pic_path, remote_file, pixmap):
         item_id = "id_multi" + str(remote_file.id)
-        css = pixmap.style
-        css = css.format(id=item_id, url=pic_path)
 
         child = ImportItem(remote_file)
         child.id = item_id
@@ -117,11 +116,7 @@ class ImportResults(ChildWindow):
 
         child.cancel.connect("clicked", self.manager.remove_source, child)
 
-        css_prov = Gtk.CssProvider()
-        css_prov.load_from_data(bytes(css, "utf8"))
-        child.style_prov = css_prov
-        child.style_ctx.add_provider_for_screen(Gdk.Screen.get_default(), css_prov,
-                                                Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+        child.thumbnail.set_pixbuf(pixmap.load_render(pic_path), pixmap.thumbnail_style)
         self.flow_box.add(child)
         self.flow_box.select_child(child)
 
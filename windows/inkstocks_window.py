@@ -4,6 +4,7 @@ import os
 import appdirs
 from gi.repository import Gtk, Gdk
 
+from core.cache_manager import MB, cache_manager
 from core.constants import CACHE_DIR, SOURCES
 from core.gui.pixmap_manager import PixmapManager, SIZE_ASPECT_GROW
 from core.gui.window import Window
@@ -48,6 +49,10 @@ class InkStockWindow(Window):
 
         if not os.path.exists(CACHE_DIR):
             os.mkdir(CACHE_DIR)
+        settings = SettingsHandler.retrieve_settings()
+        cache_manager.configure(max_bytes=settings.get("cache_max_mb", 1024) * MB,
+                                max_age_days=settings.get("cache_max_age_days"))
+        cache_manager.compact_in_background()
 
         self.sources_pixmanager = PixmapManager(CACHE_DIR, scale=3, pref_width=150,
                                                 pref_height=150, padding=40, aspect_ratio=SIZE_ASPECT_GROW, )
@@ -127,8 +132,10 @@ class InkStockWindow(Window):
 class SourcesHandler(OptionsChangeListener):
     def __init__(self, window):
         self.window = window
-        self.sources = [source(CACHE_DIR, self.window.import_manager) for source in RemoteSource.sources.values() if
-                        source.is_enabled]
+        # sources are listed from their class attributes (name, desc, icon, source_type),
+        # a source's options, data and task loop are only created the first time it's opened
+        self.sources = [source for source in RemoteSource.sources.values() if source.is_enabled]
+        self.instances: dict[type, RemoteSource] = {}
         self.displayed_sources = self.sources
         self.disabled = True  # when disabled this doesn't react to change in options window
         self.last_selected_source = None
@@ -218,9 +225,16 @@ class SourcesHandler(OptionsChangeListener):
         icon = self.window.sources_pixmanager.get_pixbuf_for_type(source.icon, "icon", None)
         self.window.source_icon.set_from_pixbuf(icon)
 
+        source = self.get_source(source)
         self.window.add_window(source.window_cls, source)
         self.window.show_window(source.window, source)
 
+    def get_source(self, source_cls) -> RemoteSource:
+        """Returns the instance of a source, creating it when it's first opened"""
+        if source_cls not in self.instances:
+            self.instances[source_cls] = source_cls(CACHE_DIR, self.window.import_manager)
+        return self.instances[source_cls]
+
 
 class SettingsHandler(OptionsChangeListener):
     def __init__(self, window: InkStockWindow):
@@ -1,9 +1,14 @@
 import enum
+import threading
 from typing import Set
 from gi.repository import Gtk
 
 from core.utils import asyncme
 
+# seconds the query has to stay unchanged before it's searched while typing,
+# on top of the delay Gtk.SearchEntry already applies to search-changed
+SEARCH_DEBOUNCE_DELAY = 0.15
+
 
 class OptionsChangeListener:
     def on_change(self, *args, **kwargs): raise NotImplementedError()
@@ -237,10 +242,34 @@ class SearchField(Option):
         self.widget("options_search_label").set_text(label)
         self.value = ""
         self.notify_on_change = False
+        self.pending_query: asyncme.DebouncedSyncVar = None
+
+    def search_as_you_type(self, delay=SEARCH_DEBOUNCE_DELAY):
+        """Notifies the receiver while the query is typed, once it has settled for `delay` seconds"""
+        self.notify_on_change = True
+        if self.pending_query:
+            self.pending_query.set_delay(delay)
+            return
+        self.pending_query = asyncme.DebouncedSyncVar(delay)
+        threading.Thread(target=self.notify_settled_queries, daemon=True, name="SearchAsYouType").start()
+
+    def notify_settled_queries(self):
+        while True:
+            query, _ = self.pending_query.get()
+            asyncme.mainloop_only(self.notify_query)(query)
+
+    def notify_query(self, query):
+        # skipped when it was already submitted
+        if query != self.value:
+            self.value = query
+            self.receiver.on_change(self)
 
     def search_changed(self, search_entry):
         if self.notify_on_change:
             query = search_entry.get_text()
+            if self.pending_query:
+                self.pending_query.replace(query)
+                return
             self.value = query
             self.receiver.on_change(self)
 
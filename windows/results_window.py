@@ -1,9 +1,15 @@
+from functools import partial
+from typing import Optional
+
 import cairo
-from gi.repository import Gtk, Gdk
-from gi.repository.GdkPixbuf import Pixbuf, InterpType
+from gi.repository import Gtk, Gdk, GLib
+from gi.repository.GdkPixbuf import Pixbuf
 
 from core.constants import CACHE_DIR
 from core.gui.pixmap_manager import PixmapManager
+from core.gui.pyramid import ThumbnailPyramid
+from core.gui.thumbnail import Thumbnail, install_screen_style
+from core.runtime import runtime
 from core.gui.window import ChildWindow
 from core.utils import asyncme
 from sources.source import RemoteSource
@@ -11,6 +17,15 @@ from sources.source_file import RemoteFile, NoMoreResultsFile
 from sources.source_page import RemotePage, NoResultsPage
 from windows.view_change_listener import ViewChangeListener
 
+# thumbnails are loaded for children this many pixels above or below the visible area
+# and dropped again once they're scrolled further away than UNLOAD_MARGIN
+VIEWPORT_MARGIN = 600
+UNLOAD_MARGIN = 3000
+# detached children kept by a results grid to be reused for the next results
+POOL_SIZE = 256
+# zoomed images of the single view kept for going back to a zoom step
+ZOOM_STEPS_CACHED = 16
+
 
 class ResultsWindow(ChildWindow):
     name = "results_window"
@@ -90,13 +105,41 @@ class FlowBoxChildWithData(Gtk.FlowBoxChild):
         self.image: Gtk.Widget = builder.get_object("result_image")
         self.result = builder.get_object("result_item")
         self.style_ctx: Gtk.StyleContext = self.result.get_style_context()
-        self.style_prov = None
+        self.thumbnail = Thumbnail(self.result)
+        self.thumbnail_requested = False
         self.button.hide()
-        if self.data.show_name:
+        if self.data and self.data.show_name:
             self.label.show()
         self.add(self.result)
         self.show()
 
+    def bind(self, data, item_id):
+        """Shows `data` in this child, for new children and recycled ones alike"""
+        if self.id:
+            self.style_ctx.remove_class(self.id)
+        self.data = data
+        self.id = item_id
+        self.style_ctx.add_class(item_id)
+        self.clear_thumbnail()
+        self.thumbnail_requested = False
+        # a recycled child may have been selected, hovered or pressed when it was detached
+        self.button.set_state_flags(Gtk.StateFlags.NORMAL, True)
+        self.button.hide()
+        self.label.set_text(data.name or "")
+        if data.name and data.show_name:
+            self.label.show()
+        else:
+            self.label.hide()
+
+    def set_thumbnail(self, pic_path, pixmaps: PixmapManager):
+        """Paints the rendered thumbnail at `pic_path` with the pixmap manager's style"""
+        self.pic_path = pic_path
+        self.thumbnail.set_pixbuf(pixmaps.load_render(pic_path), pixmaps.thumbnail_style)
+
+    def clear_thumbnail(self):
+        self.pic_path = None
+        self.thumbnail.clear()
+
 
 class SingleItemView:
     def __init__(self, window: ResultsWindow, pixmaps: PixmapManager) -> None:
@@ -132,6 +175,9 @@ class SingleItemView:
         self.selected_child = None
         self.multi_items_to_update = set()
         self.selected_pixbuf: Pixbuf = None
+        # levels of the selected image the zoom steps are scaled from, and the steps already shown
+        self.zoom_levels: Optional[ThumbnailPyramid] = None
+        self.zoomed: dict[int, Pixbuf] = {}
         self.zoom_percent = 100
 
     def back_btn_clicked(self, btn):
@@ -161,10 +207,32 @@ class SingleItemView:
 
     def __zoom_image(self):
         self.zoom_txt.set_text(str(self.zoom_percent))
+        if not self.zoom_levels:
+            return
+        pb = self.zoomed.get(self.zoom_percent)
+        if pb is not None:
+            self.image.set_from_pixbuf(pb)
+            return
         width = self.selected_pixbuf.get_width() * (self.zoom_percent / 100)
         height = self.selected_pixbuf.get_height() * (self.zoom_percent / 100)
-        pb = self.selected_pixbuf.scale_simple(int(width), int(height), InterpType.BILINEAR)
-        self.image.set_from_pixbuf(pb)
+        # zooming out scales the nearest smaller level instead of the whole image,
+        # in a worker thread so big zooms don't hold up the main loop
+        job = runtime.run_in_thread(self.zoom_levels.scaled, max(1, int(width)), max(1, int(height)))
+        job.add_done_callback(partial(self.__zoomed, self.zoom_levels, self.zoom_percent))
+
+    @asyncme.mainloop_post
+    def __zoomed(self, levels, percent, job):
+        if job.exception():
+            print(f"Error occurred while zooming image: {job.exception()}")
+            return
+        # another image was selected while this one was being scaled
+        if levels is not self.zoom_levels:
+            return
+        if len(self.zoomed) >= ZOOM_STEPS_CACHED:
+            self.zoomed.clear()
+        self.zoomed[percent] = job.result()
+        if percent == self.zoom_percent:
+            self.image.set_from_pixbuf(job.result())
 
     @asyncme.mainloop_only
     def clear(self):
@@ -211,6 +279,8 @@ class SingleItemView:
 
     def set_image(self, pixbuf: Pixbuf):
         self.selected_pixbuf = pixbuf
+        self.zoom_levels = ThumbnailPyramid(pixbuf) if pixbuf else None
+        self.zoomed.clear()
         self.zoom_percent = 100
         self.zoom_txt.set_text(str(self.zoom_percent))
         self.image.set_from_pixbuf(pixbuf)
@@ -218,8 +288,6 @@ class SingleItemView:
     @asyncme.mainloop_only
     def callback(self, pic_path, index, remote_file, selected_file):
         item_id = "id_single" + str(remote_file.id)
-        css = self.pixmaps.style
-        css = css.format(id=item_id, url=pic_path)
 
         child = FlowBoxChildWithData(remote_file)
         child.id = item_id
@@ -228,11 +296,7 @@ class SingleItemView:
         child.set_vexpand(False)
         child.label.hide()
         child.style_ctx.add_class(item_id)
-        css_prov = Gtk.CssProvider()
-        css_prov.load_from_data(bytes(css, "utf8"))
-        child.style_prov = css_prov
-        child.style_ctx.add_provider_for_screen(Gdk.Screen.get_default(), css_prov,
-                                                Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+        child.set_thumbnail(pic_path, self.pixmaps)
 
         self.children[index] = child
         self.index += 1
@@ -249,6 +313,15 @@ class SingleItemView:
 
 
 class MultiItemView:
+    """
+    Grid of the results' thumbnails.
+
+    A child is added for every result straight away, bound to its file, but thumbnails are only
+    fetched and rendered for the children in or near the visible area, and dropped again from
+    children scrolled far away. Children aren't destroyed when the results are cleared, up to
+    POOL_SIZE of them are kept and rebound to the next results.
+    """
+
     def __init__(self, window: ResultsWindow, pixmaps) -> None:
         self.builder = Gtk.Builder()
         self.pixmaps = pixmaps
@@ -256,7 +329,7 @@ class MultiItemView:
         self.opened_item = None
         self.builder.add_objects_from_file(
             'ui/results_window.ui', ["results_multi_view"])
-        self.multi_view = self.builder.get_object("results_multi_view")
+        self.multi_view: Gtk.ScrolledWindow = self.builder.get_object("results_multi_view")
         self.flow_box: Gtk.FlowBox = self.builder.get_object("results_flow")
         self.load_more_btn = self.builder.get_object("load_more_btn")
         self.load_more_txt = self.builder.get_object("load_more_text")
@@ -265,13 +338,32 @@ class MultiItemView:
         self.multi_view.show()
         self.index = 0
         self.children = {}
+        # children in the order of the results, and detached children waiting to be reused
+        self.items: list[FlowBoxChildWithData] = []
+        self.pool: list[FlowBoxChildWithData] = []
+        self.loaded: set[FlowBoxChildWithData] = set()
+        self.visibility_check = None
+
+        install_screen_style(self.pixmaps.grid_style)
+        vadjustment = self.multi_view.get_vadjustment()
+        vadjustment.connect("value-changed", self.queue_load_visible)
+        vadjustment.connect("changed", self.queue_load_visible)
+        self.flow_box.connect("size-allocate", self.queue_load_visible)
 
     @asyncme.mainloop_only
     def clear(self):
-        def remove(child: Gtk.Widget):
-            child.destroy()
-
-        self.flow_box.foreach(remove)
+        # removed children keep their selected flag, a reused child would otherwise come back selected
+        self.flow_box.unselect_all()
+        activated_items = self.window.handler.activated_items
+        for child in self.items:
+            activated_items.discard(child)
+            self.flow_box.remove(child)
+            if len(self.pool) < POOL_SIZE:
+                self.pool.append(child)
+            else:
+                child.destroy()
+        self.items.clear()
+        self.loaded.clear()
 
     def show_view(self):
         self.window.show_window(self.multi_view, "multiview" + str(id(self)))
@@ -285,33 +377,71 @@ class MultiItemView:
         self.window.show_window(stack, "no_results")
 
     def add_item(self, remote_file: RemoteFile):
-        self.pixmaps.get_pixbuf_for_type(remote_file, "multi", self.callback, remote_file)
-
-    @asyncme.mainloop_only
-    def callback(self, pic_path, remote_file):
-        item_id = "id_multi" + str(remote_file.id)
-        css = self.pixmaps.style
-        css = css.format(id=item_id, url=pic_path)
-
-        child = FlowBoxChildWithData(remote_file)
-        child.id = item_id
-        child.pic_path = pic_path
-        child.result.set_size_request(self.pixmaps.grid_item_width, self.pixmaps.grid_item_height)
-        child.style_ctx.add_class(item_id)
-
-        if remote_file.name and remote_file.show_name:
-            child.label.set_text(remote_file.name)
+        if self.pool:
+            child = self.pool.pop()
         else:
-            child.label.hide()
-        # child.set_name(item_id)
-        child.button.connect("clicked", self.window.handler.view_image, child)
-        child.button.hide()
-        css_prov = Gtk.CssProvider()
-        css_prov.load_from_data(bytes(css, "utf8"))
-        child.style_prov = css_prov
-        child.style_ctx.add_provider_for_screen(Gdk.Screen.get_default(), css_prov,
-                                                Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+            child = FlowBoxChildWithData(None)
+            child.result.set_size_request(self.pixmaps.grid_item_width, self.pixmaps.grid_item_height)
+            child.button.connect("clicked", self.window.handler.view_image, child)
+        child.bind(remote_file, "id_multi" + str(remote_file.id))
+        self.items.append(child)
         self.flow_box.add(child)
+        self.queue_load_visible()
+
+    def queue_load_visible(self, *args):
+        if self.visibility_check is None:
+            # runs after the new layout has been allocated
+            self.visibility_check = GLib.idle_add(self.load_visible)
+
+    def child_top(self, child):
+        """Returns the position of a child in the scrolled content, None if it isn't laid out yet"""
+        coords = child.translate_coordinates(self.flow_box.get_parent(), 0, 0)
+        if not coords or child.get_allocated_height() <= 1:
+            return None
+        return coords[1]
+
+    def first_child_below(self, top):
+        """Finds the first child whose bottom is below `top`, children are laid out in order"""
+        lo, hi = 0, len(self.items)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            child = self.items[mid]
+            y = self.child_top(child)
+            if y is not None and y + child.get_allocated_height() < top:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def load_visible(self):
+        self.visibility_check = None
+        vadjustment = self.multi_view.get_vadjustment()
+        top = vadjustment.get_value()
+        bottom = top + vadjustment.get_page_size()
+
+        for child in list(self.loaded):
+            y = self.child_top(child)
+            if y is None or y + child.get_allocated_height() < top - UNLOAD_MARGIN or y > bottom + UNLOAD_MARGIN:
+                self.loaded.discard(child)
+                child.clear_thumbnail()
+                child.thumbnail_requested = False
+
+        for child in self.items[self.first_child_below(top - VIEWPORT_MARGIN):]:
+            y = self.child_top(child)
+            if y is None or y > bottom + VIEWPORT_MARGIN:
+                break
+            if not child.thumbnail_requested:
+                child.thumbnail_requested = True
+                self.loaded.add(child)
+                self.pixmaps.get_pixbuf_for_type(child.data, "multi", self.callback, child, child.data,
+                                                 cancel_token=self.window.source.search_token)
+        return False
+
+    @asyncme.mainloop_only
+    def callback(self, pic_path, child, remote_file):
+        if child.data is not remote_file or not child.thumbnail_requested:
+            return  # the child was recycled or scrolled away meanwhile
+        child.set_thumbnail(pic_path, self.pixmaps)
 
 
 class ResultsHandler:
@@ -323,7 +453,11 @@ class ResultsHandler:
         self.page_items: list[RemoteFile] = []
         self.selected_resources = []
         self.current_page = None
+        self.loading_page = None
         self.activated_items = set()
+        # content of the next pages fetched ahead of "Load more" being clicked
+        self.prefetched: dict[RemotePage, list] = {}
+        self.prefetching: set[RemotePage] = set()
 
     def get_current_page_index(self):
         current_index = 0
@@ -390,23 +524,46 @@ class ResultsHandler:
             if isinstance(page, NoResultsPage):
                 self.window.multiview.show_no_results(page.message)
                 return
+            self.fetch_page_content(page, self.show_first_page)
+
+    def fetch_page_content(self, page, callback):
+        """Fetches the files of the page in the source's background loop
+        and hands them to callback in the main loop"""
+
+        def cb(result, error):
+            if error:
+                print(f"Error occurred fetching page: {error}")
+            asyncme.mainloop_post(callback)(page, result or [])
+
+        self.loading_page = page
+        self.source.add_task_to_queue(page.get_page_content_async, cb, cancel_token=self.source.search_token)
+
+    def show_first_page(self, page, files):
+        if page not in self.pages:
+            return  # results were cleared while fetching
+        self.loading_page = None
+        for file in files:
+            if isinstance(file, NoMoreResultsFile) and len(self.page_items) == 0:
+                self.window.multiview.show_no_results(file.message)
+                return
 
-            for file in page.get_page_content():
-                if isinstance(file, NoMoreResultsFile) and len(self.page_items) == 0:
-                    self.window.multiview.show_no_results(file.message)
-                    return
-
-                self.add_page_item(file)
+            self.add_page_item(file)
 
-            self.current_page = page
-            self.try_next_page(self.source, page_no=1)
+        self.current_page = page
+        self.try_next_page(self.source, page_no=1)
+        self.prefetch_pages()
 
     def clear(self):
         if self.page_items:
             self.window.multiview.clear()
+        # jobs queued for these results are skipped from now on
+        self.source.cancel_search_jobs()
+        self.cancel_prefetch()
         self.pages.clear()
         self.page_items.clear()
+        self.activated_items.clear()
         self.current_page = None
+        self.loading_page = None
         self.selected_resources.clear()
         self.source.files_selection_changed(self.selected_resources)
 
@@ -415,33 +572,109 @@ class ResultsHandler:
         self.page_items.append(file)
 
     def load_more_btn_clicked(self, widget):
+        if self.loading_page:
+            return  # still fetching the previous page
         last_index = len(self.pages) - 1
         current_index = self.get_current_page_index()
-        no_more_results = False
         if current_index < last_index:
             next_page = self.pages[current_index + 1]
-            for file in next_page.get_page_content():
-                if isinstance(file, NoMoreResultsFile):
-                    self.window.multiview.load_more_btn.hide()
-                    no_more_results = True
-                    break
-                self.add_page_item(file)
-            self.current_page = next_page
-
-            # TODO: Write another faster implementation
-            # Hide view button of any child (Work around)
-            # But might be very slow
-            def hide(child):
-                if not child.is_selected():
-                    child.button.hide()
-
-            self.window.multiview.flow_box.foreach(hide)
-            if not no_more_results:
-                current_index = self.get_current_page_index()
-                self.try_next_page(self.source, current_index + 1)
+            if next_page in self.prefetched:
+                self.show_next_page(next_page, self.prefetched.pop(next_page))
+            elif next_page in self.prefetching:
+                # shown as soon as the prefetch lands
+                self.loading_page = next_page
+            else:
+                self.fetch_page_content(next_page, self.show_next_page)
         elif current_index == last_index:
             self.try_next_page(self.source, current_index + 1)
 
+    def show_next_page(self, page, files):
+        if page not in self.pages:
+            return  # results were cleared while fetching
+        self.loading_page = None
+        no_more_results = False
+        for file in files:
+            if isinstance(file, NoMoreResultsFile):
+                self.window.multiview.load_more_btn.hide()
+                no_more_results = True
+                break
+            self.add_page_item(file)
+        self.current_page = page
+
+        # TODO: Write another faster implementation
+        # Hide view button of any child (Work around)
+        # But might be very slow
+        def hide(child):
+            if not child.is_selected():
+                child.button.hide()
+
+        self.window.multiview.flow_box.foreach(hide)
+        if not no_more_results:
+            current_index = self.get_current_page_index()
+            self.try_next_page(self.source, current_index + 1)
+            self.prefetch_pages()
+
+    def prefetch_pages(self):
+        """Fetches the content of the next `prefetch_depth` pages and their thumbnails in the background"""
+        depth = self.source.prefetch_depth
+        if not depth:
+            return
+        current_index = self.get_current_page_index()
+        # try_next_page only adds the page right after the current one. Pages further on are
+        # asked for by index, the source's current page stays the one shown
+        current_page = self.source.current_page
+        while len(self.pages) - 1 - current_index < depth:
+            no_of_pages = len(self.pages)
+            try:
+                self.source.get_page(no_of_pages)
+            finally:
+                self.source.current_page = current_page
+            if len(self.pages) == no_of_pages:
+                break
+
+        token = self.source.search_token
+        for page in self.pages[current_index + 1:current_index + 1 + depth]:
+            if page in self.prefetched or page in self.prefetching or page is self.loading_page:
+                continue
+            self.prefetching.add(page)
+
+            def cb(result, error, page=page):
+                asyncme.mainloop_post(self.page_prefetched)(page, token, result or [], error)
+
+            self.source.add_task_to_queue(page.get_page_content_async, cb, cancel_token=token)
+
+    def page_prefetched(self, page, token, files, error):
+        if token.cancelled or page not in self.pages:
+            return
+        self.prefetching.discard(page)
+        if error:
+            print(f"Error occurred prefetching page: {error}")
+            if self.loading_page is page:
+                self.fetch_page_content(page, self.show_next_page)
+            return
+
+        if self.loading_page is page:
+            # "Load more" is already waiting, the thumbnails are fetched as the page is shown
+            self.show_next_page(page, files)
+            return
+        self.prefetched[page] = files
+        for file in files:
+            if isinstance(file, RemoteFile):
+                self.source.add_task_to_queue(file.prefetch_thumbnail, self.thumbnail_prefetched, cancel_token=token)
+
+    @staticmethod
+    def thumbnail_prefetched(result, error):
+        if error:
+            print(f"Error occurred prefetching thumbnail: {error}")
+
+    def cancel_prefetch(self):
+        for files in self.prefetched.values():
+            for file in files:
+                if isinstance(file, RemoteFile):
+                    file.cancel_prefetch()
+        self.prefetched.clear()
+        self.prefetching.clear()
+
     def previous_btn_clicked(self, btn):
         children = self.window.singleview.list.get_children()
         selected = self.window.singleview.list.get_selected_children()[0]
@@ -465,6 +698,8 @@ class ResultsHandler:
         pass
 
     def try_next_page(self, source: RemoteSource, page_no):
+        if len(self.pages) > page_no:
+            return  # already added by prefetch_pages
         no_of_pages = len(self.pages)
         source.get_page(page_no)
         if len(self.pages) > no_of_pages: